@@ -1,23 +1,29 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+import json
+import math
+import time
+import threading
+from collections import namedtuple, OrderedDict
+from datetime import datetime
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, g, send_from_directory
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import generate_password_hash
 from werkzeug.utils import secure_filename
 from functools import wraps
-import requests
-from flask import jsonify, request
-import google.generativeai as genai
+import click
 from dotenv import load_dotenv
+from passwords import hasher, HashingBusy
+import geo
+import assets
 load_dotenv()
 
 app = Flask(__name__, instance_relative_config=True)
 app.secret_key = os.getenv("FLASK_SECRET_KEY")  
 GEMINI_API_KEY  = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
-gemini_model = genai.GenerativeModel('gemini-1.5-flash')
 # Ensure instance folder exists and use a stable DB path inside it
 os.makedirs(app.instance_path, exist_ok=True)
-DB_PATH = os.path.abspath(os.path.join(app.instance_path, 'houses.db'))
+# DATABASE_PATH points the app at another SQLite file (the tests use a throwaway one)
+DB_PATH = os.path.abspath(os.getenv('DATABASE_PATH') or os.path.join(app.instance_path, 'houses.db'))
 
 # ---- Database ----
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + DB_PATH
@@ -29,6 +35,11 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Keep the logged-in user's name / admin flag in the (signed) session cookie so
+# pages that only show them need no user query; re-checked against the
+# database after IDENTITY_SNAPSHOT_MAX_AGE seconds
+app.config['IDENTITY_SNAPSHOT'] = os.getenv('IDENTITY_SNAPSHOT', '1') == '1'
+app.config['IDENTITY_SNAPSHOT_MAX_AGE'] = int(os.getenv('IDENTITY_SNAPSHOT_MAX_AGE', '300'))
 db = SQLAlchemy(app)
 
 # ---- Models ----
@@ -46,10 +57,15 @@ class User(db.Model):
                                      lazy='dynamic')
 
 class House(db.Model):
+    __table_args__ = (
+        # covering indexes for the /search facet counts (see Faceted Search)
+        db.Index('ix_house_facets_by_type', 'property_type', 'bedrooms', 'bathrooms', 'area_sqm', 'price_value'),
+        db.Index('ix_house_facets_by_price', 'price_value', 'property_type', 'bedrooms', 'bathrooms', 'area_sqm'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100))
     price = db.Column(db.String(20))
-    location = db.Column(db.String(100))
+    location = db.Column(db.String(100), index=True)
     description = db.Column(db.Text)
     image = db.Column(db.String(200))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
@@ -58,7 +74,15 @@ class House(db.Model):
     bedrooms = db.Column(db.Integer, default=3)
     bathrooms = db.Column(db.Float, default=2.0)
     area_sqm = db.Column(db.Integer, default=150)
-    property_type = db.Column(db.String(50), default="House")
+    property_type = db.Column(db.String(50), default="House", index=True)
+    # ML inputs entered on the add form (JSON), used by `flask refresh-model`
+    model_features = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # From the offline geocoding table (geo.py); mirrored into the house_geo R*Tree index
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    # price as a number for the facet queries; filled on insert (ORM and bulk import alike)
+    price_value = db.Column(db.Float, default=lambda context: parse_price(context.get_current_parameters().get('price')))
     
     
     @property
@@ -84,6 +108,38 @@ class House(db.Model):
             print(f"ERROR converting '{self.price}': {e}")
             return 0.0
 
+class MarketStat(db.Model):
+    """Running price aggregates for one location, one property type, or the whole market ('all')."""
+    __table_args__ = (db.UniqueConstraint('dimension', 'key'),)
+    id = db.Column(db.Integer, primary_key=True)
+    dimension = db.Column(db.String(20), nullable=False)  # 'all', 'location' or 'property_type'
+    key = db.Column(db.String(100), nullable=False)
+    count = db.Column(db.Integer, default=0, nullable=False)
+    total = db.Column(db.Float, default=0.0, nullable=False)
+    min_price = db.Column(db.Float)
+    max_price = db.Column(db.Float)
+    sketch = db.Column(db.Text, default='{}', nullable=False)  # market_stats quantile sketch (JSON)
+
+    def as_dict(self):
+        import market_stats
+        sketch = json.loads(self.sketch or '{}')
+        median, p90 = market_stats.quantile(sketch, 0.5), market_stats.quantile(sketch, 0.9)
+        return {
+            'dimension': self.dimension,
+            'key': self.key,
+            'count': self.count,
+            'average_price': round(self.total / self.count, 2) if self.count else None,
+            'min_price': self.min_price,
+            'max_price': self.max_price,
+            'median_price': round(median, 2) if median is not None else None,
+            'p90_price': round(p90, 2) if p90 is not None else None,
+        }
+
+class CacheVersion(db.Model):
+    """Token replaced whenever the data behind a per-process cache changes; caches compare it before reuse."""
+    name = db.Column(db.String(50), primary_key=True)
+    token = db.Column(db.String(32), nullable=False)
+
 class HouseImage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     house_id = db.Column(db.Integer, db.ForeignKey('house.id'), nullable=False)
@@ -97,46 +153,193 @@ class UserFavorites(db.Model):
     house_id = db.Column(db.Integer, db.ForeignKey('house.id'), primary_key=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
+# ---- Lazy heavy dependencies ----
+# Gemini and the ML stack are imported on first use, so importing app.py
+# (and starting each worker) only pays for Flask and SQLAlchemy.
+_gemini_model = None
+def get_gemini_model():
+    global _gemini_model
+    if _gemini_model is None:
+        import google.generativeai as genai
+        genai.configure(api_key=GEMINI_API_KEY)
+        _gemini_model = genai.GenerativeModel('gemini-1.5-flash')
+    return _gemini_model
+
+_model_client = None
+def get_model_client():
+    """Client for model_server.py, or None when the model runs in-process."""
+    global _model_client
+    if _model_client is None and os.getenv('MODEL_SERVER_ADDRESS'):
+        from model_server import ModelClient
+        _model_client = ModelClient(os.getenv('MODEL_SERVER_ADDRESS'))
+    return _model_client
+
 _cached_predictor = None
-def predict_price(features):
+def preload_predictor():
     """
-    Try to call houseprice.predict_price() lazily.
-    If import fails or prediction fails, return a simple fallback estimate.
+    Resolve the price predictor and load the saved model now instead of on
+    the first /predict_price request. gunicorn.conf.py calls this in the
+    master before forking so workers share the model pages copy-on-write.
+    Only loads; no warm-up prediction, since OpenMP thread pools started in
+    the master do not survive fork.
+    When MODEL_SERVER_ADDRESS is set, predictions go to model_server.py
+    instead and the workers never load the model at all.
+    The predictor returns {"price": ..., "p10": ..., "p90": ...}.
     """
     global _cached_predictor
+    if _cached_predictor is None and get_model_client() is not None:
+        _cached_predictor = get_model_client().predict_one
     if _cached_predictor is None:
         try:
             # try to import the project's predictor helper (lazy)
-            from houseprice import predict_price as real_predict_price  # type: ignore
-            _cached_predictor = real_predict_price
+            import houseprice  # type: ignore
+            houseprice.load_model()
+            _cached_predictor = houseprice.predict_price_range
         except Exception:
-            # fallback: simple heuristic function
+            # fallback: simple heuristic function (no range available)
             def fallback(f):
                 base = 100000.0
                 area = float(f.get('gr_liv_area', f.get('GrLivArea', 1500))) if f else 1500.0
                 baths = float(f.get('TotalBath', f.get('total_bath', 2))) if f else 2.0
                 qual = float(f.get('overall_qual', f.get('OverallQual', 5))) if f else 5.0
-                return round(base + area * 100.0 + baths * 20000.0 + qual * 15000.0, 2)
+                price = round(base + area * 100.0 + baths * 20000.0 + qual * 15000.0, 2)
+                return {'price': price, 'p10': None, 'p90': None}
             _cached_predictor = fallback
+    return _cached_predictor
+
+def predict_price_range(features):
+    """
+    Try to call houseprice.predict_price_range() lazily.
+    If import fails or prediction fails, return a simple fallback estimate
+    with no range.
+    """
     try:
-        return _cached_predictor(features)
+        return preload_predictor()(features)
     except Exception:
         # final fallback if predictor errors
-        base = 100000.0
-        area = float(features.get('gr_liv_area', 1500))
-        baths = float(features.get('TotalBath', 2))
-        return round(base + area * 100.0 + baths * 20000.0, 2)
+        return fallback_price_range(features)
+
+def fallback_price_range(features):
+    """Simple estimate used when no model is available (no range)."""
+    base = 100000.0
+    area = float(features.get('gr_liv_area', 1500))
+    baths = float(features.get('TotalBath', 2))
+    return {'price': round(base + area * 100.0 + baths * 20000.0, 2), 'p10': None, 'p90': None}
+
+def predict_price(features):
+    return predict_price_range(features)['price']
+
+def predict_prices(features_list):
+    """Batched predict_price(): one model call for the whole list."""
+    if not features_list:
+        return []
+    try:
+        preload_predictor()
+        if get_model_client() is not None:
+            try:
+                return [r['price'] for r in get_model_client().predict_many(features_list)]
+            except Exception:
+                # one try per batch: retrying row by row would reconnect to a dead server every time
+                app.logger.exception("Model server unavailable; using fallback estimates")
+                return [fallback_price_range(features)['price'] for features in features_list]
+        import houseprice
+        return houseprice.predict_prices(features_list)
+    except Exception:
+        # model unavailable: per-row fallback estimates
+        return [predict_price(features) for features in features_list]
+
+# ---- Static Assets ----
+# `flask build-assets` (run by gunicorn.conf.py at startup) writes minified,
+# content-hashed copies of the CSS / JS to static/dist/. url_for('static', ...)
+# then points at those, and they are served with a one-year immutable
+# Cache-Control plus a precompressed .br / .gz variant when the browser takes it.
+# Until assets are built, and in debug mode, the plain files are used.
+ASSET_MAX_AGE = 365 * 24 * 3600
+asset_manifest = assets.load_manifest(app.static_folder)
+
+def build_assets(clean=False):
+    manifest, stats = assets.build(app.static_folder, clean=clean)
+    asset_manifest.clear()
+    asset_manifest.update(manifest)
+    return stats
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    if endpoint == 'static' and not app.debug:
+        built = asset_manifest.get(values.get('filename'))
+        if built:
+            values['filename'] = built
+
+def serve_static(filename):
+    if not filename.startswith(assets.DIST_DIR + '/'):
+        return app.send_static_file(filename)
+    import mimetypes
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[encoding] and os.path.isfile(os.path.join(app.static_folder, filename + suffix)):
+            response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype, max_age=ASSET_MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(app.static_folder, filename, mimetype=mimetype, max_age=ASSET_MAX_AGE)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+app.view_functions['static'] = serve_static
+
+@app.cli.command('build-assets')
+@click.option('--clean', is_flag=True, help='Delete files left over from earlier builds.')
+def build_assets_command(clean):
+    """Minify, fingerprint and precompress the CSS / JS in static/ into static/dist/."""
+    stats = build_assets(clean=clean)
+    for name, sizes in stats.items():
+        compressed = ', '.join(f"{kind} {sizes[kind]:,}" for kind in ('gz', 'br') if kind in sizes)
+        click.echo(f"{name:16s} -> {asset_manifest[name]:32s} {sizes['source']:>7,} B, minified {sizes['minified']:,}, {compressed}")
 
 # ---- Helper Functions ----
 def is_logged_in():
     return 'user_id' in session and session.get('user_id') is not None
 
+# The logged-in user is loaded at most once per request and cached on flask.g
 def get_current_user():
+    if '_current_user' not in g:
+        uid = session.get('user_id')
+        # Use query.filter_by to avoid legacy Query.get warning
+        g._current_user = User.query.filter_by(id=uid).first() if uid is not None else None
+    return g._current_user
+
+# What templates need to know about the logged-in user, read from the session
+SessionIdentity = namedtuple('SessionIdentity', ['id', 'username', 'is_admin'])
+
+def remember_identity(user):
+    session['user_id'] = user.id
+    session['username'] = user.username
+    session['is_admin'] = user.is_admin
+    session['identity_checked_at'] = int(time.time())
+
+def get_current_identity():
+    """
+    The logged-in user for read-only pages (navbar, buttons): a SessionIdentity
+    from the session snapshot while it is fresh, otherwise the User row.
+    Anything that changes data or checks ownership should use get_current_user().
+    """
     uid = session.get('user_id')
     if uid is None:
         return None
-    # Use query.filter_by to avoid legacy Query.get warning
-    return User.query.filter_by(id=uid).first()
+    if '_current_user' in g or not app.config['IDENTITY_SNAPSHOT']:
+        return get_current_user()
+    checked_at = session.get('identity_checked_at')
+    if checked_at is not None and 'username' in session and \
+            time.time() - checked_at < app.config['IDENTITY_SNAPSHOT_MAX_AGE']:
+        return SessionIdentity(uid, session['username'], bool(session.get('is_admin')))
+    user = get_current_user()
+    if user is None:
+        session.clear()  # the user was deleted
+    else:
+        remember_identity(user)
+    return user
 
 def login_required(f):
     @wraps(f)
@@ -154,7 +357,7 @@ def index():
     return render_template('index.html', 
                          houses=houses, 
                          search_query=None,
-                         current_user=get_current_user())
+                         current_user=get_current_identity())
 
 @app.route('/ai_description', methods=['POST'])
 def ai_description():
@@ -173,7 +376,7 @@ Use sensory language, make the reader fall in love instantly, never mention pric
 """
 
     try:
-        response = gemini_model.generate_content(prompt)
+        response = get_gemini_model().generate_content(prompt)
         text = response.text.strip()
         return jsonify({"description": text})
     except Exception as e:
@@ -197,27 +400,25 @@ def add_house():
         area_sqm = int(request.form.get('area_sqm', 150))
         property_type = request.form.get('property_type', 'House')
 
-        def safe_int(value, default=0):
+        def safe_int(value, default=None):
             try:
                 value = value.strip()
                 return int(value) if value != '' else default
             except Exception:
                 return default
-        def safe_float(value, default=0.0):
+        def safe_float(value, default=None):
             try:
                 value = value.strip()
                 return float(value) if value != '' else default
             except Exception:
                 return default
-        user_features = {
-            "overall_qual": safe_int(request.form.get("overall_qual")),
-            "gr_liv_area": safe_float(request.form.get("gr_liv_area")),
-            "TotalBath": safe_float(request.form.get("total_bath")),
-            "TotalSF": safe_float(request.form.get("total_sf")),
-            "HouseAge": safe_int(request.form.get("house_age")),
-            "RemodelAge": safe_int(request.form.get("remodel_age"))
-        }
-        user_features["OverallQual_GrLivArea"] = user_features["overall_qual"] * user_features["gr_liv_area"]
+        # fields left empty (or unreadable) are left out for the model to fill in
+        user_features = {}
+        for key, name, cast in MODEL_FEATURE_KEYS:
+            value = (safe_int if cast is int else safe_float)(request.form.get(key))
+            if value is not None:
+                user_features[name] = value
+        with_interaction(user_features)
 
         predicted_price = predict_price(user_features)
 
@@ -250,10 +451,14 @@ def add_house():
             bedrooms=request.form.get('bedrooms'),
             bathrooms=request.form.get('bathrooms'),
             area_sqm=request.form.get('area_sqm'),
-            property_type=request.form.get('property_type')
+            property_type=request.form.get('property_type'),
+            model_features=json.dumps(user_features)
         )
+        house.latitude, house.longitude = geo.geocode(location) or (None, None)
 
         db.session.add(house)
+        record_market_change([house], +1)
+        mark_listings_changed()
         db.session.commit()
 
           # ---- Save optional interior images ----
@@ -275,7 +480,7 @@ def add_house():
         flash(f'Property added successfully! Predicted price was ${predicted_price:,.2f}', 'success')
         return redirect(url_for('index'))
 
-    return render_template('add_house.html', current_user=get_current_user())
+    return render_template('add_house.html', current_user=get_current_identity())
 
 @app.route('/house/<int:id>')
 def view_house(id):
@@ -288,7 +493,7 @@ def view_house(id):
                            house=house, 
                            interior_images=interior_images, 
                            similar_houses=similar_houses, 
-                           current_user=get_current_user())
+                           current_user=get_current_identity())
 
 # ---- Authentication Routes ----
 @app.route('/login', methods=['GET', 'POST'])
@@ -299,19 +504,34 @@ def login():
         password = request.form.get('password', '')
         
         user = User.query.filter_by(username=username).first()
+        # Give the DB connection back to the pool before the slow hash check,
+        # so a burst of logins cannot starve page requests of connections
+        db.session.close()
         
-        if user and check_password_hash(user.password_hash, password):
+        try:
+            password_ok = user is not None and hasher.verify(user.password_hash, password)
+        except HashingBusy:
+            flash('Too many login attempts right now, please try again in a moment.', 'warning')
+            return render_template('login.html', current_user=get_current_identity()), 503
+        # Upgrade hashes made with an older work factor while we have the plain password;
+        # if the pool is busy the upgrade waits for a later login, the user still gets in
+        if password_ok and hasher.needs_rehash(user.password_hash):
+            try:
+                User.query.filter_by(id=user.id).update({'password_hash': hasher.hash(password)})
+                db.session.commit()
+            except HashingBusy:
+                pass
+
+        if password_ok:
             # Login successful
-            session['user_id'] = user.id
-            session['username'] = user.username
-            session['is_admin'] = user.is_admin
+            remember_identity(user)
             flash('Login successful!', 'success')
             return redirect(url_for('index'))
         else:
             flash('Invalid username or password', 'danger')
     else:
         # If there's an existing session that points to a missing user, clear it to avoid redirect loops
-        if session.get('user_id') is not None and User.query.filter_by(id=session.get('user_id')).first() is None:
+        if session.get('user_id') is not None and get_current_user() is None:
             session.clear()
     return render_template('login.html', current_user=get_current_user())
 
@@ -335,7 +555,12 @@ def register():
             flash('Email already exists!', 'danger')
             return redirect(url_for('register'))
         
-        hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
+        db.session.close()  # don't hold a pooled connection while hashing
+        try:
+            hashed_password = hasher.hash(password)
+        except HashingBusy:
+            flash('The server is busy, please try again in a moment.', 'warning')
+            return redirect(url_for('register'))
         new_user = User(
             username=username,
             email=email,
@@ -349,7 +574,7 @@ def register():
         flash('Registration successful! Please login.', 'success')
         return redirect(url_for('login'))
     
-    return render_template('register.html', current_user=get_current_user())
+    return render_template('register.html', current_user=get_current_identity())
 
 @app.route('/logout')
 def logout():
@@ -388,16 +613,10 @@ def is_favorite(house_id):
     if not is_logged_in():
         return jsonify({'is_favorite': False})
     
-    user = get_current_user()
-    if not user:
-        return jsonify({'is_favorite': False})
-    
     try:
-        # Check if house is in user's favorites
-        for favorite in user.favorite_houses:
-            if favorite.id == house_id:
-                return jsonify({'is_favorite': True})
-        return jsonify({'is_favorite': False})
+        # Primary-key lookup of the favorites row; no need to load the user or all their favorites
+        favorite = db.session.get(UserFavorites, (session['user_id'], house_id))
+        return jsonify({'is_favorite': favorite is not None})
     except Exception as e:
         print(f"Error checking favorite: {e}")
         return jsonify({'is_favorite': False})
@@ -408,20 +627,19 @@ def add_favorite(house_id):
         return jsonify({'success': False, 'message': 'Please login to add favorites'})
     
     try:
-        house = House.query.get(house_id)
-        if not house:
-            return jsonify({'success': False, 'message': 'Property not found'})
-        
         user = get_current_user()
         if not user:
             return jsonify({'success': False, 'message': 'User not found'})
         
+        house = db.session.get(House, house_id)
+        if not house:
+            return jsonify({'success': False, 'message': 'Property not found'})
+        
         # Check if already favorited
-        for favorite in user.favorite_houses:
-            if favorite.id == house_id:
-                return jsonify({'success': False, 'message': 'Already in favorites'})
+        if db.session.get(UserFavorites, (user.id, house_id)) is not None:
+            return jsonify({'success': False, 'message': 'Already in favorites'})
         
-        user.favorite_houses.append(house)
+        db.session.add(UserFavorites(user_id=user.id, house_id=house_id))
         db.session.commit()
         
         return jsonify({'success': True, 'message': 'Added to favorites'})
@@ -437,22 +655,19 @@ def remove_favorite(house_id):
         return jsonify({'success': False, 'message': 'Please login'})
     
     try:
-        house = House.query.get(house_id)
-        if not house:
-            return jsonify({'success': False, 'message': 'Property not found'})
-        
         user = get_current_user()
         if not user:
             return jsonify({'success': False, 'message': 'User not found'})
         
-        # Find and remove the favorite
-        for favorite in user.favorite_houses:
-            if favorite.id == house_id:
-                user.favorite_houses.remove(favorite)
-                db.session.commit()
-                return jsonify({'success': True, 'message': 'Removed from favorites'})
+        favorite = db.session.get(UserFavorites, (user.id, house_id))
+        if favorite is None:
+            if db.session.get(House, house_id) is None:
+                return jsonify({'success': False, 'message': 'Property not found'})
+            return jsonify({'success': False, 'message': 'Not in favorites'})
         
-        return jsonify({'success': False, 'message': 'Not in favorites'})
+        db.session.delete(favorite)
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'Removed from favorites'})
     
     except Exception as e:
         print(f"Error removing favorite: {e}")
@@ -464,21 +679,255 @@ def remove_favorite(house_id):
 def predict_price_api():
     try:
         data = request.get_json() or {}
-        user_features = {
-            "overall_qual": int(float(data.get("overall_qual", 0))) if data.get("overall_qual") is not None else 0,
-            "gr_liv_area": float(data.get("gr_liv_area", 0)) if data.get("gr_liv_area") is not None else 0.0,
-            "TotalBath": float(data.get("total_bath", 0)) if data.get("total_bath") is not None else 0.0,
-            "TotalSF": float(data.get("total_sf", 0)) if data.get("total_sf") is not None else 0.0,
-            "HouseAge": int(float(data.get("house_age", 0))) if data.get("house_age") is not None else 0,
-            "RemodelAge": int(float(data.get("remodel_age", 0))) if data.get("remodel_age") is not None else 0,
-        }
-        user_features["OverallQual_GrLivArea"] = user_features["overall_qual"] * user_features["gr_liv_area"]
-        predicted_price = predict_price(user_features)
-        return jsonify({'predicted_price': round(float(predicted_price), 2)})
+        user_features = model_features_from(data)
+        predicted = predict_price_range(user_features)
+        return jsonify({
+            'predicted_price': round(float(predicted['price']), 2),
+            # p10 / p90 of the quantile model; null when only a point estimate is available
+            'price_low': round(predicted['p10'], 2) if predicted['p10'] is not None else None,
+            'price_high': round(predicted['p90'], 2) if predicted['p90'] is not None else None,
+        })
     except Exception as e:
         app.logger.exception("Error in predict_price_api")
         return jsonify({'error': str(e)})
 
+# ---- Bulk Import Route ----
+BULK_IMPORT_CHUNK_SIZE = 1000
+BULK_IMPORT_MAX_ERRORS = 1000  # per-row errors returned in detail; the rest are only counted
+
+MODEL_FEATURE_KEYS = [  # (form key, model input, type)
+    ("overall_qual", "overall_qual", int),
+    ("gr_liv_area", "gr_liv_area", float),
+    ("total_bath", "TotalBath", float),
+    ("total_sf", "TotalSF", float),
+    ("house_age", "HouseAge", int),
+    ("remodel_age", "RemodelAge", int),
+]
+
+def with_interaction(features):
+    # overall_qual x gr_liv_area, only when both were given
+    if "overall_qual" in features and "gr_liv_area" in features:
+        features["OverallQual_GrLivArea"] = features["overall_qual"] * features["gr_liv_area"]
+    return features
+
+def model_features_from(data):
+    """
+    Model inputs from form-style keys (total_bath, house_age, ...). Missing or
+    empty values are left out: the model fills them with its defaults, and the
+    drift monitor counts them as missing instead of as real zeros.
+    """
+    features = {}
+    for key, name, cast in MODEL_FEATURE_KEYS:
+        value = data.get(key)
+        if value is not None and str(value).strip() != '':
+            number = float(value)
+            if not math.isfinite(number):
+                raise ValueError(f'{key} must be a finite number, got {value!r}')
+            features[name] = cast(number)
+    return with_interaction(features)
+
+def read_listing_rows(stream, fmt):
+    """Yield (line number, row dict) from a binary CSV or JSON Lines stream without reading it all."""
+    import csv
+    import io
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_no, line in enumerate(text, 1):
+            if line.strip():
+                try:
+                    yield line_no, json.loads(line)
+                except ValueError as e:
+                    yield line_no, e
+
+def validate_listing_row(row):
+    """Turn one input row into (House column values, model features); raises ValueError."""
+    if isinstance(row, Exception):
+        raise ValueError(f'invalid JSON: {row}')
+    if not isinstance(row, dict):
+        raise ValueError('row must be an object')
+    title = str(row.get('title') or '').strip()
+    location = str(row.get('location') or '').strip()
+    if not title:
+        raise ValueError('title is required')
+    if not location:
+        raise ValueError('location is required')
+
+    def number(key, cast, default):
+        value = row.get(key)
+        if value is None or str(value).strip() == '':
+            return default
+        try:
+            number = float(str(value).replace(',', ''))
+            if not math.isfinite(number):  # nan, inf, 1e400
+                raise ValueError()
+            return cast(number)
+        except (ValueError, OverflowError):
+            raise ValueError(f'{key} must be a number, got {value!r}')
+
+    price = number('price', float, None)
+    if price is not None and price <= 0:
+        raise ValueError('price must be positive')
+    # explicit coordinates win over the geocoding table
+    latitude, longitude = number('latitude', float, None), number('longitude', float, None)
+    if (latitude is None) != (longitude is None):
+        raise ValueError('latitude and longitude must be given together')
+    if latitude is None:
+        latitude, longitude = geo.geocode(location) or (None, None)
+    elif not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError('latitude/longitude out of range')
+    try:
+        features = model_features_from(row)
+    except ValueError as e:
+        raise ValueError(f'invalid model feature: {e}')
+    listing = {
+        'title': title[:100],
+        'price': price,
+        'location': location[:100],
+        'description': str(row.get('description') or ''),
+        'image': str(row.get('image') or '') or None,
+        'owner_phone': str(row.get('owner_phone') or '') or None,
+        'owner_email': str(row.get('owner_email') or '') or None,
+        'bedrooms': number('bedrooms', int, 3),
+        'bathrooms': number('bathrooms', float, 2.0),
+        'area_sqm': number('area_sqm', int, 150),
+        'property_type': str(row.get('property_type') or 'House'),
+        'model_features': json.dumps(features),
+        'latitude': latitude,
+        'longitude': longitude,
+    }
+    return listing, features
+
+def import_listings(rows, user_id=None, chunk_size=BULK_IMPORT_CHUNK_SIZE, progress=None):
+    """
+    Insert listings from (line number, row) pairs, one chunk per transaction.
+    Each chunk is validated, rows without a price get one batched prediction,
+    and the valid rows are inserted with a single executemany INSERT.
+    `progress(rows_read, inserted)` is called after every chunk.
+    """
+    from itertools import islice
+    from sqlalchemy import insert
+
+    result = {'rows': 0, 'inserted': 0, 'error_count': 0, 'errors': []}
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        result['rows'] += len(chunk)
+
+        listings, features = [], []
+        for line_no, row in chunk:
+            try:
+                listing, row_features = validate_listing_row(row)
+            except (ValueError, OverflowError) as e:
+                result['error_count'] += 1
+                if len(result['errors']) < BULK_IMPORT_MAX_ERRORS:
+                    result['errors'].append({'line': line_no, 'error': str(e)})
+                continue
+            listing['user_id'] = user_id
+            listings.append(listing)
+            features.append(row_features)
+
+        missing = [i for i, listing in enumerate(listings) if listing['price'] is None]
+        for i, price in zip(missing, predict_prices([features[i] for i in missing])):
+            listings[i]['price'] = price
+        for listing in listings:
+            listing['price'] = str(listing['price'])
+
+        if listings:
+            try:
+                db.session.execute(insert(House), listings)
+                record_market_change(listings, +1)
+                mark_listings_changed()
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                result['error_count'] += len(listings)
+                if len(result['errors']) < BULK_IMPORT_MAX_ERRORS:
+                    result['errors'].append({'line': chunk[0][0],
+                                             'error': f'chunk of {len(listings)} rows not inserted: {e}'})
+                listings = []
+        result['inserted'] += len(listings)
+        if progress:
+            progress(result['rows'], result['inserted'])
+    return result
+
+def _import_format(filename, content_type, requested=None):
+    if requested:
+        return 'csv' if requested == 'csv' else 'jsonl'
+    if (filename or '').lower().endswith('.csv') or 'csv' in (content_type or ''):
+        return 'csv'
+    return 'jsonl'
+
+@app.route('/import_listings', methods=['POST'])
+def import_listings_api():
+    """Bulk import from an uploaded `file` field or the raw request body (CSV or JSON Lines)."""
+    if not is_logged_in():
+        return jsonify({'success': False, 'message': 'Please login to import listings'}), 401
+    upload = request.files.get('file')
+    if upload:
+        stream, fmt = upload.stream, _import_format(upload.filename, upload.mimetype, request.args.get('format'))
+    else:
+        stream, fmt = request.stream, _import_format(None, request.mimetype, request.args.get('format'))
+    try:
+        result = import_listings(read_listing_rows(stream, fmt), user_id=session.get('user_id'))
+    except Exception as e:
+        app.logger.exception("Error in import_listings_api")
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
+@app.cli.command('import-listings')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--owner', help='Username to own the imported listings.')
+@click.option('--chunk-size', default=BULK_IMPORT_CHUNK_SIZE)
+def import_listings_command(path, fmt, owner, chunk_size):
+    """Bulk import listings from a CSV or JSON Lines file."""
+    user_id = None
+    if owner:
+        user = User.query.filter_by(username=owner).first()
+        if user is None:
+            raise click.ClickException(f"No user named {owner!r}")
+        user_id = user.id
+    fmt = _import_format(path, None, fmt)
+    with open(path, 'rb') as stream:
+        result = import_listings(
+            read_listing_rows(stream, fmt), user_id=user_id, chunk_size=chunk_size,
+            progress=lambda read, inserted: click.echo(f"{read} rows read, {inserted} inserted"))
+    for error in result['errors']:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+    click.echo(f"Done: {result['inserted']} of {result['rows']} rows inserted, {result['error_count']} errors")
+
+# ---- Prediction Monitoring ----
+def get_drift_report():
+    """Input drift statistics from whichever process runs the model."""
+    if get_model_client() is not None:
+        return get_model_client().drift_report()
+    import houseprice
+    return houseprice.drift_report()
+
+@app.route('/drift-report')
+def drift_report():
+    try:
+        return jsonify(get_drift_report())
+    except Exception as e:
+        app.logger.exception("Error building drift report")
+        return jsonify({'error': str(e)}), 503
+
+@app.route('/metrics')
+def metrics():
+    from monitoring import render_metrics
+    try:
+        body = render_metrics(get_drift_report())
+    except Exception as e:
+        app.logger.exception("Error building metrics")
+        return f"# error: {e}\n", 503, {'Content-Type': 'text/plain; charset=utf-8'}
+    return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 # ---- Delete Property Route ----
 @app.route('/delete_house/<int:id>', methods=['POST'])
 @login_required
@@ -487,7 +936,7 @@ def delete_house(id):
     
     # Check if the current user owns the house or is admin
     user = get_current_user()
-    if house.user_id != user.id and not user.is_admin:
+    if user is None or (house.user_id != user.id and not user.is_admin):
         flash('You can only delete your own properties!', 'danger')
         return redirect(url_for('profile'))
     
@@ -505,6 +954,8 @@ def delete_house(id):
             os.remove(os.path.join(app.config['UPLOAD_FOLDER'], house.image))
         for img in house.images:
             os.remove(os.path.join(app.config['UPLOAD_FOLDER'], img.filename))
+        record_market_change([house], -1)
+        mark_listings_changed()
         db.session.commit()
         
         flash('Property deleted successfully!', 'success')
@@ -521,6 +972,7 @@ def reset_db():
     if app.debug:
         with app.app_context():
             db.drop_all()
+            drop_geo_index()
             init_db()
         flash('Database has been reset with sample data', 'success')
         return redirect(url_for('index'))
@@ -535,8 +987,10 @@ def reset_favorites():
             with app.app_context():
                 # Drop all tables
                 db.drop_all()
+                drop_geo_index()
                 # Recreate all tables with new schema
                 db.create_all()
+                ensure_geo_index()
                 
                 # Create admin user
                 admin_user = User(
@@ -631,7 +1085,10 @@ def reset_favorites():
 
                 ]
                 for house in sample_houses:
+                    house.latitude, house.longitude = geo.geocode(house.location) or (None, None)
                     db.session.add(house)
+                record_market_change(sample_houses, +1)
+                mark_listings_changed()
                 
                 db.session.commit()
                 flash('Database reset with favorites support!', 'success')
@@ -648,6 +1105,7 @@ def init_db():
     with app.app_context():
         # Create tables if missing
         db.create_all()
+        ensure_geo_index()
         # Seed admin + sample houses only when no users exist
         if User.query.first() is None:
             admin_user = User(
@@ -700,7 +1158,10 @@ def init_db():
                 )
             ]
             for house in sample_houses:
+                house.latitude, house.longitude = geo.geocode(house.location) or (None, None)
                 db.session.add(house)
+            record_market_change(sample_houses, +1)
+            mark_listings_changed()
             db.session.commit()
             print("Database initialized with sample data")
         else:
@@ -712,13 +1173,45 @@ def search():
     city = request.args.get('city', '').strip()
     min_price = request.args.get('min_price', '').strip()
     max_price = request.args.get('max_price', '').strip()
+    near = request.args.get('near', '').strip()
+    radius = request.args.get('radius', '').strip()
+    bbox = request.args.get('bbox', '').strip()
     
     print(f"\n=== DEBUG SEARCH ===")
-    print(f"City: '{city}', Min: '{min_price}', Max: '{max_price}'")
+    print(f"City: '{city}', Min: '{min_price}', Max: '{max_price}', Near: '{near}', Radius: '{radius}', Bbox: '{bbox}'")
     
-    # Start with all houses
-    houses = House.query.all()
-    print(f"Total houses: {len(houses)}")
+    # Map search: near=<place or lat,lon>&radius=<km>, or bbox=min_lon,min_lat,max_lon,max_lat
+    area = None
+    try:
+        area = geo_search_area(near, radius, bbox)
+    except ValueError as e:
+        flash(f'Invalid map search: {e}', 'warning')
+    
+    # Facet selections (property_type, bedrooms, bathrooms, area, price_range) are applied in SQL;
+    # an invalid one is dropped with a warning and the other filters still apply
+    filter_errors = {}
+    filters = facet_filters(request.args, errors=filter_errors)
+    for name, message in filter_errors.items():
+        if name not in ('min_price', 'max_price'):  # the price filters below warn about those
+            flash(f'Invalid filter: {message}', 'warning')
+    selected = dict(filters, city='', min_price=None, max_price=None)
+    
+    if area:
+        # Start with the listings in the area (R*Tree index), nearest first
+        hits = geo_search(*area)
+        by_id = {h.id: h for h in House.query.filter(House.id.in_([house_id for house_id, _ in hits]),
+                                                      *_facet_conditions(selected))}
+        houses = []
+        for house_id, distance in hits:
+            house = by_id.get(house_id)
+            if house is not None:
+                house.distance_km = round(distance, 1)
+                houses.append(house)
+        print(f"Houses in map area: {len(houses)}")
+    else:
+        # Start with all houses
+        houses = House.query.filter(*_facet_conditions(selected)).all()
+        print(f"Total houses: {len(houses)}")
     
     # Apply city filter
     if city:
@@ -772,6 +1265,12 @@ def search():
         search_parts.append(f'min price: €{min_price}')
     if max_price:
         search_parts.append(f'max price: €{max_price}')
+    if area and near:
+        search_parts.append(f'within {area[2]:g} km of {near}')
+    elif area:
+        search_parts.append('in map area')
+    for name, chosen in selected_facet_labels(filters).items():
+        search_parts.append(f"{name.replace('_', ' ')}: {' / '.join(chosen)}")
     
     search_query = ', '.join(search_parts) if search_parts else None
     
@@ -781,7 +1280,10 @@ def search():
     return render_template('index.html', 
                          houses=houses, 
                          search_query=search_query,
-                         current_user=get_current_user())
+                         # counts cover the city / price / facet filters, not the map area,
+                         # so map searches show none and skip computing them
+                         facets=None if area else facet_links(get_facets(filters)[0], request.args),
+                         current_user=get_current_identity())
 
 @app.route('/test-prices')
 def test_prices():
@@ -814,7 +1316,764 @@ def debug_prices():
     return jsonify(results)
 
 
+# ---- Streaming Export ----
+EXPORT_COLUMNS = ['id', 'title', 'price', 'location', 'description', 'image', 'user_id',
+                  'owner_phone', 'owner_email', 'bedrooms', 'bathrooms', 'area_sqm', 'property_type',
+                  'latitude', 'longitude']
+# Owner contact details and account ids stay out of the public /export_listings
+# download (the CLI, run on the server, still exports them)
+PRIVATE_EXPORT_COLUMNS = {'user_id', 'owner_phone', 'owner_email'}
+PUBLIC_EXPORT_COLUMNS = [name for name in EXPORT_COLUMNS if name not in PRIVATE_EXPORT_COLUMNS]
+EXPORT_BATCH_ROWS = 1000
+
+def parse_price(value):
+    """Same conversion as House.price_as_float, without the debug output; None if unparseable."""
+    try:
+        return float(str(value).replace('€', '').replace(',', '').strip())
+    except ValueError:
+        return None
+
+def _price_arg(args, name):
+    value = (args.get(name) or '').strip().replace(',', '')
+    return float(value) if value else None
+
+def export_filters(args):
+    """Filters with the same meaning as /search: city substring, min/max price. Raises ValueError."""
+    return {
+        'city': (args.get('city') or '').strip(),
+        'min_price': _price_arg(args, 'min_price'),
+        'max_price': _price_arg(args, 'max_price'),
+    }
+
+def iter_listing_export(filters, fmt='ndjson', columns=EXPORT_COLUMNS):
+    """
+    Yield the export as text chunks. Rows are read EXPORT_BATCH_ROWS at a
+    time from a streaming cursor (yield_per) as plain tuples, so memory
+    stays flat however many listings match.
+    """
+    import csv
+    import io
+    from sqlalchemy import select
+
+    query = select(*(getattr(House, name) for name in columns)).order_by(House.id)
+    if filters['city']:
+        # same match as /search: a literal substring, so % and _ are not wildcards
+        query = query.where(House.location.icontains(filters['city'], autoescape=True))
+    rows = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_ROWS))
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer:
+        # sent on its own so an export with no matching rows still has the header
+        writer.writerow(columns)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    for partition in rows.partitions():
+        for row in partition:
+            # price is stored as text, so the price filters run here, as in /search
+            if filters['min_price'] is not None or filters['max_price'] is not None:
+                price = parse_price(row.price)
+                if price is None:
+                    continue
+                if filters['min_price'] is not None and price < filters['min_price']:
+                    continue
+                if filters['max_price'] is not None and price > filters['max_price']:
+                    continue
+            if writer:
+                writer.writerow(row)
+            else:
+                buffer.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+                buffer.write('\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+def gzip_chunks(chunks):
+    """Gzip a stream of text chunks on the fly."""
+    import zlib
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.route('/export_listings')
+def export_listings():
+    """Stream listings as NDJSON (default) or CSV (?format=csv); ?gzip=1 sends a .gz file. No owner contact columns."""
+    from flask import Response, stream_with_context
+    fmt = 'csv' if request.args.get('format') == 'csv' else 'ndjson'
+    try:
+        filters = export_filters(request.args)
+    except ValueError:
+        return jsonify({'error': 'min_price and max_price must be numbers'}), 400
+
+    chunks = iter_listing_export(filters, fmt, columns=PUBLIC_EXPORT_COLUMNS)
+    filename = 'listings.csv' if fmt == 'csv' else 'listings.ndjson'
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    if request.args.get('gzip') in ('1', 'true', 'yes'):
+        chunks, filename, mimetype = gzip_chunks(chunks), filename + '.gz', 'application/gzip'
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@app.cli.command('export-listings')
+@click.argument('output', type=click.Path(dir_okay=False, allow_dash=True), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default='ndjson')
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output.')
+@click.option('--city', default='')
+@click.option('--min-price', default='')
+@click.option('--max-price', default='')
+def export_listings_command(output, fmt, compress, city, min_price, max_price):
+    """Export listings to OUTPUT (default stdout) without loading them all into memory."""
+    try:
+        filters = export_filters({'city': city, 'min_price': min_price, 'max_price': max_price})
+    except ValueError:
+        raise click.ClickException('--min-price and --max-price must be numbers')
+    chunks = iter_listing_export(filters, fmt)
+    if compress:
+        chunks = gzip_chunks(chunks)
+    else:
+        chunks = (chunk.encode('utf-8') for chunk in chunks)
+    with click.open_file(output, 'wb') as out:
+        for chunk in chunks:
+            out.write(chunk)
+
+
+# ---- Market Statistics ----
+def _market_groups(location, property_type):
+    # a missing property type counts as the column default, 'House'
+    return [('all', ''), ('location', location or ''), ('property_type', property_type or 'House')]
+
+def _market_group_filter(dimension, key):
+    if dimension == 'location':
+        return House.location == key if key else House.location.is_(None) | (House.location == '')
+    if key == 'House':
+        return House.property_type.is_(None) | (House.property_type == key)
+    return House.property_type == key
+
+def _price_sql():
+    # SQL version of parse_price(): strip € and thousands separators, cast to a number
+    return db.cast(db.func.replace(db.func.replace(House.price, '€', ''), ',', ''), db.Float)
+
+def _group_price_range(dimension, key):
+    price = _price_sql()
+    query = db.session.query(db.func.min(price), db.func.max(price)).filter(price > 0)
+    if dimension != 'all':
+        query = query.filter(_market_group_filter(dimension, key))
+    return query.one()
+
+def record_market_change(listings, sign):
+    """
+    Add (sign=+1) or remove (sign=-1) listings from the MarketStat rows, in
+    the caller's transaction. `listings` are House objects or column dicts.
+    count, sum and the quantile sketch are updated in place; min/max are
+    only re-queried for a group when its current extreme is removed.
+    """
+    import market_stats
+    changes = {}
+    for listing in listings:
+        if isinstance(listing, dict):
+            price, location, property_type = listing.get('price'), listing.get('location'), listing.get('property_type')
+        else:
+            # attribute access, so expired / unloaded columns are loaded instead of skipped
+            price, location, property_type = listing.price, listing.location, listing.property_type
+        price = parse_price(price)
+        if price is None or price <= 0:
+            continue
+        for group in _market_groups(location, property_type):
+            changes.setdefault(group, []).append(price)
+
+    for (dimension, key), prices in changes.items():
+        stat = MarketStat.query.filter_by(dimension=dimension, key=key).first()
+        if stat is None:
+            if sign < 0:
+                continue
+            stat = MarketStat(dimension=dimension, key=key, count=0, total=0.0, sketch='{}')
+            db.session.add(stat)
+        sketch = json.loads(stat.sketch)
+        for price in prices:
+            market_stats.add(sketch, price, sign)
+        stat.sketch = json.dumps(sketch)
+        stat.count += sign * len(prices)
+        stat.total += sign * sum(prices)
+        if sign > 0:
+            stat.min_price = min(prices) if stat.min_price is None else min(stat.min_price, *prices)
+            stat.max_price = max(prices) if stat.max_price is None else max(stat.max_price, *prices)
+        elif stat.count <= 0:
+            db.session.delete(stat)
+        elif min(prices) <= stat.min_price or max(prices) >= stat.max_price:
+            stat.min_price, stat.max_price = _group_price_range(dimension, key)
+
+def compute_market_stats():
+    """Aggregates recomputed from every listing, as {(dimension, key): MarketStat} (not added to the session)."""
+    import market_stats
+    from sqlalchemy import select
+    # plain [count, total, min, max, {bucket: count}] accumulators; ORM objects are built at the end
+    groups = {}
+    rows = db.session.execute(select(House.location, House.property_type, House.price)
+                              .execution_options(yield_per=EXPORT_BATCH_ROWS))
+    for location, property_type, price in rows:
+        price = parse_price(price)
+        if price is None or price <= 0:
+            continue
+        bucket = str(market_stats.bucket(price))
+        for group in _market_groups(location, property_type):
+            acc = groups.get(group)
+            if acc is None:
+                acc = groups[group] = [0, 0.0, price, price, {}]
+            acc[0] += 1
+            acc[1] += price
+            if price < acc[2]:
+                acc[2] = price
+            elif price > acc[3]:
+                acc[3] = price
+            acc[4][bucket] = acc[4].get(bucket, 0) + 1
+    return {
+        (dimension, key): MarketStat(dimension=dimension, key=key, count=count, total=total,
+                                     min_price=low, max_price=high, sketch=json.dumps(sketch))
+        for (dimension, key), (count, total, low, high, sketch) in groups.items()
+    }
+
+def rebuild_market_stats():
+    MarketStat.query.delete()
+    db.session.add_all(compute_market_stats().values())
+    db.session.commit()
+
+def ensure_market_stats():
+    """Fill the market stats from the existing listings when the table is still empty (e.g. just created)."""
+    if MarketStat.query.first() is None and House.query.first() is not None:
+        rebuild_market_stats()
+
+@app.route('/market-stats')
+@app.route('/market-stats/<dimension>')
+@app.route('/market-stats/<dimension>/<path:key>')
+def market_stats_api(dimension='all', key=None):
+    """Whole-market stats, every group of a dimension, or one group (a single indexed row)."""
+    if dimension not in ('all', 'location', 'property_type'):
+        return jsonify({'error': 'dimension must be all, location or property_type'}), 404
+    if dimension == 'all' or key is not None:
+        stat = MarketStat.query.filter_by(dimension=dimension, key=key or '').first()
+        if stat is None:
+            return jsonify({'dimension': dimension, 'key': key or '', 'count': 0})
+        return jsonify(stat.as_dict())
+    stats = MarketStat.query.filter_by(dimension=dimension).order_by(MarketStat.count.desc()).all()
+    return jsonify([stat.as_dict() for stat in stats])
+
+@app.cli.command('rebuild-market-stats')
+@click.option('--verify', is_flag=True, help='Only compare the stored stats with a fresh computation.')
+def rebuild_market_stats_command(verify):
+    """Recompute the market statistics from all listings."""
+    if not verify:
+        rebuild_market_stats()
+        click.echo(f"Rebuilt {MarketStat.query.count()} market stat rows")
+        return
+    fresh = {group: stat.as_dict() for group, stat in compute_market_stats().items()}
+    stored = {(stat.dimension, stat.key): stat.as_dict() for stat in MarketStat.query.all()}
+    mismatched = 0
+    for group in sorted(set(fresh) | set(stored)):
+        expected, actual = fresh.get(group), stored.get(group)
+        if expected is None or actual is None or any(
+                expected[field] != actual[field] and not (
+                    isinstance(expected[field], float) and abs(expected[field] - actual[field]) <= 0.01)
+                for field in expected):
+            mismatched += 1
+            click.echo(f"{group}: stored {actual} != recomputed {expected}")
+    if mismatched:
+        raise click.ClickException(f"{mismatched} of {len(fresh)} groups differ")
+    click.echo(f"All {len(fresh)} groups match")
+
+
+# ---- Geospatial Search ----
+# Listings with coordinates are mirrored into an SQLite R*Tree virtual table
+# (house_geo). Triggers on the house table keep it in sync, so every write
+# path (ORM, bulk import, deletes, raw SQL) updates the index. /search asks it
+# for the rectangle around the requested area, then keeps the hits that are
+# really inside by exact (haversine) distance.
+GEO_INDEX_TABLE = 'house_geo'
+GEO_SEARCH_DEFAULT_RADIUS_KM = 5.0
+GEO_SEARCH_MAX_RADIUS_KM = 1000.0
+GEO_SEARCH_MAX_RESULTS = int(os.getenv('GEO_SEARCH_MAX_RESULTS', '500'))
+
+_GEO_INDEX_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {GEO_INDEX_TABLE} USING rtree(id, min_lat, max_lat, min_lon, max_lon)",
+    f"""CREATE TRIGGER IF NOT EXISTS house_geo_insert AFTER INSERT ON house
+        WHEN NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL BEGIN
+            INSERT INTO {GEO_INDEX_TABLE} VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS house_geo_update AFTER UPDATE OF latitude, longitude ON house BEGIN
+            DELETE FROM {GEO_INDEX_TABLE} WHERE id = OLD.id;
+            INSERT INTO {GEO_INDEX_TABLE}
+                SELECT NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude
+                WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL;
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS house_geo_delete AFTER DELETE ON house BEGIN
+            DELETE FROM {GEO_INDEX_TABLE} WHERE id = OLD.id;
+        END""",
+]
+
+def ensure_geo_index():
+    """Create the R*Tree index and its triggers if missing; a new index is filled from the existing listings."""
+    from sqlalchemy import text
+    with db.engine.begin() as conn:
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+                              {'name': GEO_INDEX_TABLE}).first()
+        for statement in _GEO_INDEX_DDL:
+            conn.execute(text(statement))
+        if not exists:
+            conn.execute(text(f"INSERT INTO {GEO_INDEX_TABLE} "
+                              "SELECT id, latitude, latitude, longitude, longitude FROM house "
+                              "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"))
+
+def drop_geo_index():
+    # db.drop_all() does not know about the virtual table (the triggers go with the house table)
+    from sqlalchemy import text
+    with db.engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {GEO_INDEX_TABLE}"))
+
+def geo_search_area(near, radius, bbox):
+    """
+    (rectangle, center, radius_km) for the /search map parameters, or None if
+    neither is given; near= takes precedence over bbox=. Raises ValueError.
+    For a bbox the results are ordered by distance from its center.
+    """
+    if near:
+        center = geo.parse_point(near)
+        try:
+            radius_km = float(radius) if radius else GEO_SEARCH_DEFAULT_RADIUS_KM
+        except ValueError:
+            raise ValueError(f'radius must be a number of km, got {radius!r}')
+        if not 0 < radius_km <= GEO_SEARCH_MAX_RADIUS_KM:
+            raise ValueError(f'radius must be between 0 and {GEO_SEARCH_MAX_RADIUS_KM:g} km')
+        return geo.bbox_around(center[0], center[1], radius_km), center, radius_km
+    if bbox:
+        rect = geo.parse_bbox(bbox)
+        return rect, ((rect[0] + rect[1]) / 2, (rect[2] + rect[3]) / 2), None
+    return None
+
+def geo_search(rect, center, radius_km=None, limit=GEO_SEARCH_MAX_RESULTS):
+    """
+    [(house id, km from center)] for the listings inside `rect`
+    (min_lat, max_lat, min_lon, max_lon) and, if radius_km is given, within
+    radius_km of `center`: the `limit` nearest, nearest first.
+    """
+    import heapq
+    from sqlalchemy import text
+    min_lat, max_lat, min_lon, max_lon = rect
+    rows = db.session.execute(text(
+        f"SELECT h.id, h.latitude, h.longitude FROM {GEO_INDEX_TABLE} g JOIN house h ON h.id = g.id "
+        "WHERE g.max_lat >= :min_lat AND g.min_lat <= :max_lat AND g.max_lon >= :min_lon AND g.min_lon <= :max_lon"),
+        {'min_lat': min_lat, 'max_lat': max_lat, 'min_lon': min_lon, 'max_lon': max_lon})
+    lat0, lon0 = center
+    hits = []
+    for house_id, lat, lon in rows:
+        # the R*Tree stores 32-bit floats rounded outwards; filter on the exact coordinates
+        if not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+            continue
+        distance = geo.haversine_km(lat0, lon0, lat, lon)
+        if radius_km is None or distance <= radius_km:
+            hits.append((distance, house_id))
+    return [(house_id, distance) for distance, house_id in heapq.nsmallest(limit, hits)]
+
+@app.cli.command('geocode-listings')
+@click.option('--all', 'redo', is_flag=True, help='Also re-geocode listings that already have coordinates.')
+def geocode_listings_command(redo):
+    """Fill in listing coordinates from the offline geocoding table (geo.py / GEOCODE_TABLE)."""
+    from sqlalchemy import select, update
+    locations = select(House.location).distinct()
+    if not redo:
+        locations = locations.where(House.latitude.is_(None))
+    located = unknown = 0
+    # one UPDATE per distinct location; the triggers update the R*Tree index
+    for location in db.session.scalars(locations).all():
+        point = geo.geocode(location)
+        if point is None:
+            unknown += 1
+            continue
+        stmt = update(House).where(House.location == location)
+        if not redo:
+            stmt = stmt.where(House.latitude.is_(None))
+        # coordinates are not model inputs: keep updated_at (the refresh-model watermark) as it is
+        result = db.session.execute(
+            stmt.values(latitude=point[0], longitude=point[1], updated_at=House.updated_at)
+                .execution_options(synchronize_session=False))
+        located += result.rowcount
+        db.session.commit()
+    click.echo(f"Geocoded {located} listings; {unknown} distinct locations not in the geocoding table.")
+
+# ---- Faceted Search ----
+# /search can narrow results by property type, bedrooms, bathrooms, area range
+# and price band, and shows how many listings each choice leaves. Each facet is
+# counted with one GROUP BY query that applies every other filter (so with
+# "Apartment" selected the other types still show their counts); the
+# ix_house_facets_* indexes on House cover these queries. Counts are cached per
+# process and thrown away when the 'listings' CacheVersion token changes, which
+# every listing write (add, import, delete, seeding) does via mark_listings_changed().
+AREA_RANGES = [(0, 50), (50, 100), (100, 150), (150, 200), (200, 300), (300, None)]
+PRICE_RANGES = [(0, 100000), (100000, 250000), (250000, 500000), (500000, 1000000),
+                (1000000, 2000000), (2000000, None)]
+FACET_CACHE_SIZE = int(os.getenv('FACET_CACHE_SIZE', '256'))
+_facet_cache = OrderedDict()  # filters key -> (listings token, facets)
+_facet_cache_lock = threading.Lock()
+
+def _range_key(low, high):
+    return f'{low}-{high}' if high is not None else f'{low}+'
+
+def _range_label(low, high):
+    return f'{low:,}\u2013{high:,}' if high is not None else f'{low:,}+'
+
+def _parse_range(key, ranges):
+    for low, high in ranges:
+        if _range_key(low, high) == key:
+            return low, high
+    raise ValueError(f'unknown range {key!r}')
+
+def facet_filters(args, errors=None):
+    """
+    The /search filters from request args: export_filters() plus the facet
+    selections (property_type, bedrooms, bathrooms, area, price_range; each
+    may be repeated to select several values). Raises ValueError, unless a
+    dict is passed as `errors`: then each invalid filter is left out and its
+    message stored under the filter's name.
+    """
+    def field(name, parse, default):
+        try:
+            return parse()
+        except ValueError as e:
+            if errors is None:
+                raise
+            errors[name] = str(e)
+            return default
+
+    def values(name, cast, ranges=None):
+        try:
+            selected = sorted({cast(value.strip()) for value in args.getlist(name) if value.strip()})
+        except ValueError:
+            raise ValueError(f'invalid {name} value')
+        for key in selected if ranges else ():
+            try:
+                _parse_range(key, ranges)
+            except ValueError:
+                raise ValueError(f'invalid {name} value {key!r}')
+        return selected
+
+    def price(name):
+        try:
+            return _price_arg(args, name)
+        except ValueError:
+            raise ValueError(f'{name} must be a number')
+
+    return {
+        'city': (args.get('city') or '').strip(),
+        'min_price': field('min_price', lambda: price('min_price'), None),
+        'max_price': field('max_price', lambda: price('max_price'), None),
+        'property_type': field('property_type', lambda: values('property_type', str), []),
+        'bedrooms': field('bedrooms', lambda: values('bedrooms', int), []),
+        'bathrooms': field('bathrooms', lambda: values('bathrooms', float), []),
+        'area': field('area', lambda: values('area', str, AREA_RANGES), []),
+        'price_range': field('price_range', lambda: values('price_range', str, PRICE_RANGES), []),
+    }
+
+def _in_ranges(column, keys, ranges):
+    conditions = []
+    for key in keys:
+        low, high = _parse_range(key, ranges)
+        conditions.append(db.and_(column >= low, column < high) if high is not None else column >= low)
+    return db.or_(*conditions)
+
+def _facet_conditions(filters, exclude=None):
+    """SQL conditions for `filters`, leaving out the facet named `exclude`."""
+    conditions = []
+    if filters['city']:
+        conditions.append(House.location.icontains(filters['city'], autoescape=True))
+    if filters['min_price'] is not None:
+        conditions.append(House.price_value >= filters['min_price'])
+    if filters['max_price'] is not None:
+        conditions.append(House.price_value <= filters['max_price'])
+    if filters['property_type'] and exclude != 'property_type':
+        condition = House.property_type.in_(filters['property_type'])
+        if 'House' in filters['property_type']:
+            # a missing property type counts as the column default, like in the market stats
+            condition = condition | House.property_type.is_(None)
+        conditions.append(condition)
+    if filters['bedrooms'] and exclude != 'bedrooms':
+        conditions.append(House.bedrooms.in_(filters['bedrooms']))
+    if filters['bathrooms'] and exclude != 'bathrooms':
+        conditions.append(House.bathrooms.in_(filters['bathrooms']))
+    if filters['area'] and exclude != 'area':
+        conditions.append(_in_ranges(House.area_sqm, filters['area'], AREA_RANGES))
+    if filters['price_range'] and exclude != 'price_range':
+        conditions.append(_in_ranges(House.price_value, filters['price_range'], PRICE_RANGES))
+    return conditions
+
+FACET_NAMES = ('property_type', 'bedrooms', 'bathrooms', 'area', 'price_range')
+
+def _facet_label(name, value):
+    if name in ('area', 'price_range'):
+        return _range_label(*_parse_range(value, AREA_RANGES if name == 'area' else PRICE_RANGES))
+    return f'{value:g}' if isinstance(value, float) else str(value)
+
+def selected_facet_labels(filters):
+    """{name: labels of the selected values} for the facets in `filters`, in the order compute_facets() lists them."""
+    labels = {}
+    for name in FACET_NAMES:
+        values = filters[name]
+        if name in ('area', 'price_range'):
+            keys = [_range_key(low, high) for low, high in (AREA_RANGES if name == 'area' else PRICE_RANGES)]
+            values = sorted(values, key=keys.index)
+        if values:
+            labels[name] = [_facet_label(name, value) for value in values]
+    return labels
+
+def _range_bucket(column, ranges):
+    # range key of a value as a SQL CASE; NULL for missing / non-positive values
+    whens = [(db.or_(column.is_(None), column <= 0), db.null())]
+    whens += [(column < high, _range_key(low, high)) for low, high in ranges if high is not None]
+    return db.case(*whens, else_=_range_key(*ranges[-1]))
+
+def compute_facets(filters):
+    """{'total': matching listings, 'facets': {name: [{'value', 'label', 'count', 'selected'}]}}, straight from SQL."""
+    facets = {}
+    grouped = {
+        'property_type': House.property_type,
+        'bedrooms': House.bedrooms,
+        'bathrooms': House.bathrooms,
+        'area': _range_bucket(House.area_sqm, AREA_RANGES),
+        'price_range': _range_bucket(House.price_value, PRICE_RANGES),
+    }
+    for name, key in grouped.items():
+        rows = (db.session.query(key, db.func.count())
+                .filter(*_facet_conditions(filters, exclude=name))
+                .group_by(key).all())
+        counts = {}
+        for value, count in rows:
+            if name == 'property_type' and value is None:
+                value = 'House'
+            if value is not None:
+                counts[value] = counts.get(value, 0) + count
+        if name in ('area', 'price_range'):
+            ranges = AREA_RANGES if name == 'area' else PRICE_RANGES
+            options = [(_range_key(low, high), _range_label(low, high)) for low, high in ranges]
+        else:
+            values = sorted(set(counts) | set(filters[name]))
+            options = [(value, _facet_label(name, value)) for value in values]
+        # selected values stay listed even with no matches, so they can be unselected
+        facets[name] = [{'value': value, 'label': label, 'count': counts.get(value, 0),
+                         'selected': value in filters[name]}
+                        for value, label in options if value in counts or value in filters[name]]
+    total = db.session.query(db.func.count()).select_from(House).filter(*_facet_conditions(filters)).scalar()
+    return {'total': total, 'facets': facets}
+
+def backfill_price_values():
+    """Fill House.price_value for listings stored before the column existed (or written with raw SQL)."""
+    from sqlalchemy import text
+    with db.engine.begin() as conn:
+        # same conversion as _price_sql(); the IS NULL test is answered by ix_house_facets_by_price
+        conn.execute(text("UPDATE house SET price_value = CAST(REPLACE(REPLACE(price, '€', ''), ',', '') AS REAL) "
+                          "WHERE price_value IS NULL AND price IS NOT NULL"))
+
+def mark_listings_changed():
+    """Invalidate every process's cached facet counts; call in the transaction that changes listings."""
+    token = os.urandom(16).hex()
+    version = db.session.get(CacheVersion, 'listings')
+    if version is None:
+        db.session.add(CacheVersion(name='listings', token=token))
+    else:
+        version.token = token
+
+def get_facets(filters):
+    """(compute_facets(filters), whether it came from the cache)."""
+    key = json.dumps(filters, sort_keys=True)
+    version = db.session.get(CacheVersion, 'listings')
+    token = version.token if version is not None else None
+    with _facet_cache_lock:
+        cached = _facet_cache.get(key)
+        if cached is not None and cached[0] == token:
+            _facet_cache.move_to_end(key)
+            return cached[1], True
+    facets = compute_facets(filters)
+    with _facet_cache_lock:
+        _facet_cache[key] = (token, facets)
+        _facet_cache.move_to_end(key)
+        while len(_facet_cache) > FACET_CACHE_SIZE:
+            _facet_cache.popitem(last=False)
+    return facets, False
+
+def facet_links(facets, args):
+    """Copy of `facets` where each option has the /search URL that toggles it on or off."""
+    linked = {'total': facets['total'], 'facets': {}}
+    for name, options in facets['facets'].items():
+        linked['facets'][name] = []
+        for option in options:
+            params = args.to_dict(flat=False)
+            current = params.get(name, [])
+            if option['selected']:
+                params[name] = [value for value in current if not _same_facet_value(name, value, option['value'])]
+            else:
+                params[name] = current + [str(option['value'])]
+            linked['facets'][name].append(dict(option, url=url_for('search', **params)))
+    return linked
+
+def _same_facet_value(name, arg, value):
+    try:
+        return {'bedrooms': int, 'bathrooms': float}.get(name, str)(arg.strip()) == value
+    except ValueError:
+        return False
+
+@app.route('/search/facets')
+def search_facets():
+    """Facet counts for the /search filters, as JSON."""
+    try:
+        filters = facet_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    facets, cached = get_facets(filters)
+    return jsonify({**facets, 'filters': filters, 'cached': cached})
+
+# ---- Startup Budget Report ----
+# Budgets for a cold `import app` and for one worker's peak RSS once the
+# model is loaded. Override via env to tighten them in CI.
+IMPORT_TIME_BUDGET_MS = float(os.getenv('IMPORT_TIME_BUDGET_MS', 1000))
+WORKER_RSS_BUDGET_MB = float(os.getenv('WORKER_RSS_BUDGET_MB', 400))
+
+def _parse_importtime(stderr, root='app'):
+    """Return (total_us, [(cumulative_us, module), ...]) for imports made directly by `root`."""
+    total, pending, children = 0, [], []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|', 2)
+        name = name[1:]
+        level = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if level == 1:
+            pending.append((int(cumulative_us), name))
+        elif level == 0:
+            # -X importtime prints children before their parent
+            if name == root:
+                total, children = int(cumulative_us), pending
+            pending = []
+    return total, sorted(children, reverse=True)
+
+def measure_startup(with_model=True):
+    """
+    Import app in a fresh interpreter and return (import ms, [(cumulative_us,
+    module), ...] for its direct imports, peak RSS in MB). Raises RuntimeError
+    if the import fails.
+    """
+    import subprocess
+    import sys
+    probe = 'import app, resource\n'
+    if with_model:
+        probe += 'app.preload_predictor()\n'
+    probe += 'print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe],
+                            cwd=app.root_path, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    total_us, children = _parse_importtime(result.stderr)
+    rss_mb = int(result.stdout.strip().splitlines()[-1]) / 1024  # ru_maxrss is KiB on Linux
+    return total_us / 1000, children, rss_mb
+
+@app.cli.command('startup-report')
+@click.option('--top', default=10, help='Number of direct imports to list.')
+@click.option('--with-model/--without-model', default=True,
+              help='Also load the price model before measuring RSS.')
+def startup_report(top, with_model):
+    """Report `import app` time and worker RSS against their budgets."""
+    try:
+        import_ms, children, rss_mb = measure_startup(with_model)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f"import app: {import_ms:.1f} ms (budget {IMPORT_TIME_BUDGET_MS:.0f} ms)")
+    for cumulative_us, name in children[:top]:
+        click.echo(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+    click.echo(f"worker peak RSS: {rss_mb:.1f} MB (budget {WORKER_RSS_BUDGET_MB:.0f} MB)")
+
+    over = []
+    if import_ms > IMPORT_TIME_BUDGET_MS:
+        over.append('import time')
+    if rss_mb > WORKER_RSS_BUDGET_MB:
+        over.append('worker RSS')
+    if over:
+        raise click.ClickException(f"Over budget: {', '.join(over)}")
+
+
+# ---- Incremental Model Refresh ----
+def listing_features(house):
+    """Model inputs for a listing: derived from its columns, overridden by whatever was entered on the add form."""
+    features = {}
+    if house.area_sqm:
+        features['gr_liv_area'] = float(house.area_sqm) * 10.7639  # m² -> ft², as in the Ames data
+    if house.bathrooms:
+        features['TotalBath'] = float(house.bathrooms)
+    # listings added without any ML fields store '{}'
+    features.update(json.loads(house.model_features or '{}'))
+    return features
+
+@app.cli.command('refresh-model')
+@click.option('--rounds', default=50, help='Boosting rounds to add on top of the current model.')
+@click.option('--min-rows', default=20, help='Skip the refresh when fewer new listings than this.')
+@click.option('--tolerance', default=0.02, help='Allowed relative RMSE increase on the new-listing holdout.')
+@click.option('--max-reference-drift', default=0.25,
+              help='Allowed relative RMSE increase on the stored sample of the original training data.')
+def refresh_model_command(rounds, min_rows, tolerance, max_reference_drift):
+    """Continue training the price model on listings added since the last refresh."""
+    import houseprice
+    artifact = houseprice.load_model()
+    watermark = artifact.get('watermark')
+
+    query = House.query.order_by(House.updated_at)
+    if watermark:
+        query = query.filter(House.updated_at > datetime.fromisoformat(watermark))
+    features, prices, newest = [], [], None
+    for house in query.yield_per(1000):
+        price = parse_price(house.price)
+        if price is not None and price > 0:
+            features.append(listing_features(house))
+            prices.append(price)
+        if house.updated_at is not None:
+            newest = house.updated_at
+
+    if len(prices) < min_rows:
+        click.echo(f"Only {len(prices)} new listings since {watermark or 'the start'}; nothing to do.")
+        return
+
+    refreshed, report = houseprice.refresh_model(artifact, features, prices, n_rounds=rounds, tolerance=tolerance,
+                                                  max_reference_drift=max_reference_drift)
+    click.echo(f"{report['rows']} listings, holdout RMSE (log price) "
+               f"{report['holdout_rmse_before']:.4f} -> {report['holdout_rmse_after']:.4f} "
+               f"on {report['holdout_rows']} rows")
+    if 'reference_rmse_before' in report:
+        click.echo(f"reference RMSE {report['reference_rmse_before']:.4f} -> {report['reference_rmse_after']:.4f}")
+    if refreshed is None:
+        raise click.ClickException('Refreshed model failed validation; keeping the current one.')
+
+    refreshed['watermark'] = newest.isoformat() if newest else watermark
+    houseprice.save_model(refreshed)
+    click.echo(f"Saved refreshed model to {houseprice.MODEL_PATH}")
+
+
 # ---- Setup Database ----
+def upgrade_schema():
+    """Add columns and indexes introduced after the database was created (create_all only creates missing tables)."""
+    from sqlalchemy import inspect, text
+    inspector = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+
 def setup_database():
     # If DB exists, ensure tables and leave data alone; otherwise create and seed
     if os.path.exists(DB_PATH):
@@ -822,6 +2081,10 @@ def setup_database():
         # ensure tables exist
         with app.app_context():
             db.create_all()
+            upgrade_schema()
+            ensure_geo_index()
+            backfill_price_values()
+            ensure_market_stats()
         return True
 
     try:
@@ -0,0 +1,205 @@
+"""
+Static asset build: minify, fingerprint and precompress CSS / JS.
+
+build() takes every .css and .js file at the top of static/ and writes
+static/dist/<name>.<content hash>.<ext>, a .gz next to it and, if the
+optional `brotli` package is installed, a .br. static/dist/manifest.json maps
+each source name to its built file. app.py rewrites
+url_for('static', filename='style.css') through the manifest and serves dist/
+files with immutable Cache-Control headers: a changed file gets a new name, so
+browsers never need to revalidate the old one.
+
+The minifiers only remove what is certainly safe (comments, indentation,
+whitespace around CSS punctuation); JS keeps its line breaks so automatic
+semicolon insertion is unaffected.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 10
+EXTENSIONS = ('.css', '.js')
+
+
+def _split_strings(text, quotes):
+    # (is_string, chunk) pieces; string chunks include their quotes and are left untouched
+    pieces, start, i = [], 0, 0
+    while i < len(text):
+        if text[i] in quotes:
+            quote, j = text[i], i + 1
+            while j < len(text) and text[j] != quote:
+                j += 2 if text[j] == '\\' else 1
+            pieces.append((False, text[start:i]))
+            pieces.append((True, text[i:j + 1]))
+            start = i = j + 1
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            end = len(text) if end == -1 else end + 2
+            pieces.append((False, text[start:i]))
+            start = i = end
+        else:
+            i += 1
+    pieces.append((False, text[start:]))
+    return pieces
+
+
+def minify_css(text):
+    # merge the code around removed comments so whitespace on both sides collapses together
+    pieces = []
+    for is_string, chunk in _split_strings(text, '"\''):
+        if pieces and not is_string and not pieces[-1][0]:
+            pieces[-1] = (False, pieces[-1][1] + chunk)
+        else:
+            pieces.append((is_string, chunk))
+    out = []
+    for is_string, chunk in pieces:
+        if not is_string:
+            chunk = re.sub(r'\s+', ' ', chunk)
+            # no space needed around these; not ':' before (`a :hover`) or '+' / '-' (calc())
+            chunk = re.sub(r' ?([{};,>]) ?', r'\1', chunk)
+            chunk = re.sub(r': ', ':', chunk)
+            chunk = chunk.replace(';}', '}')
+        out.append(chunk)
+    return ''.join(out).strip()
+
+
+# After one of these a '/' starts a regular expression, not a division
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^') | {''}
+# ... and after one of these keywords, but not after an identifier ending in one (`origin / 2`)
+_REGEX_KEYWORD = re.compile(r'(?<![\w$])(?:return|typeof|case|do|else|in|of|new|delete|void|throw)$')
+
+
+def minify_js(text):
+    """Drop comments, indentation and blank lines (strings, template literals and regexes are copied as-is)."""
+    out, i, n = [], 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch in '"\'`':
+            j = i + 1
+            while j < n and text[j] != ch:
+                j += 2 if text[j] == '\\' else 1
+            out.append(text[i:j + 1])
+            i = j + 1
+        elif text.startswith('//', i):
+            end = text.find('\n', i)
+            i = n if end == -1 else end
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+        elif ch == '/':
+            before = next((chunk.rstrip() for chunk in reversed(out) if chunk.strip()), '')
+            if before[-1:] in _REGEX_PRECEDERS or _REGEX_KEYWORD.search(before):
+                # regex literal: up to the closing '/' outside a [...] class, plus flags
+                j, in_class = i + 1, False
+                while j < n and (in_class or text[j] != '/') and text[j] != '\n':
+                    if text[j] == '\\':
+                        j += 1
+                    elif text[j] == '[':
+                        in_class = True
+                    elif text[j] == ']':
+                        in_class = False
+                    j += 1
+                j += 1
+                while j < n and text[j].isalpha():
+                    j += 1
+                out.append(text[i:j])
+                i = j
+            else:
+                out.append(ch)
+                i += 1
+        else:
+            j = i
+            while j < n and text[j] not in '"\'`/':
+                j += 1
+            out.append(text[i:j])
+            i = j
+    # whitespace only changes outside the copied literals above, but a template
+    # literal may span lines: only touch lines that are not inside one
+    lines, result, in_template = ''.join(out).split('\n'), [], False
+    for line in lines:
+        stripped = line if in_template else line.strip()
+        if stripped or in_template:
+            result.append(stripped.rstrip() if not in_template else stripped)
+        if _unescaped_count(line, '`') % 2:
+            in_template = not in_template
+    return '\n'.join(result)
+
+
+def _unescaped_count(line, char):
+    count, i = 0, 0
+    while i < len(line):
+        if line[i] == '\\':
+            i += 2
+            continue
+        if line[i] == char:
+            count += 1
+        i += 1
+    return count
+
+
+def _minify(name, text):
+    return minify_css(text) if name.endswith('.css') else minify_js(text)
+
+
+def build(static_folder, clean=False):
+    """
+    Build every asset and write the manifest. Returns ({source name: built name},
+    {source name: byte sizes per stage}). Old builds are kept unless `clean`.
+    """
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    dist = os.path.join(static_folder, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    manifest, stats = {}, {}
+    for name in sorted(os.listdir(static_folder)):
+        path = os.path.join(static_folder, name)
+        if not name.endswith(EXTENSIONS) or not os.path.isfile(path):
+            continue
+        with open(path, encoding='utf-8') as f:
+            source = f.read()
+        data = _minify(name, source).encode('utf-8')
+        stem, ext = os.path.splitext(name)
+        built = f'{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}'
+        variants = {'': data, '.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(data, quality=11)
+        for suffix, content in variants.items():
+            target = os.path.join(dist, built + suffix)
+            if not os.path.exists(target):  # same name means same content
+                with open(target + '.tmp', 'wb') as f:
+                    f.write(content)
+                os.replace(target + '.tmp', target)
+        manifest[name] = f'{DIST_DIR}/{built}'
+        stats[name] = {'source': os.path.getsize(path), 'minified': len(data),
+                       **{suffix.lstrip('.'): len(content) for suffix, content in variants.items() if suffix}}
+    with open(os.path.join(dist, MANIFEST_NAME + '.tmp'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(os.path.join(dist, MANIFEST_NAME + '.tmp'), os.path.join(dist, MANIFEST_NAME))
+    if clean:
+        keep = {built.split('/', 1)[1] for built in manifest.values()}
+        for filename in os.listdir(dist):
+            base = filename[:-3] if filename.endswith(('.gz', '.br')) else filename
+            if filename != MANIFEST_NAME and base not in keep:
+                os.remove(os.path.join(dist, filename))
+    return manifest, stats
+
+
+def load_manifest(static_folder):
+    """{source name: built name} from the last build, or {} if assets were never built."""
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+if __name__ == '__main__':
+    folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    for source, built in build(folder)[0].items():
+        print(f'{source} -> {built}')
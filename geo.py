@@ -0,0 +1,145 @@
+"""
+Offline geocoding and distance helpers for the map search.
+
+Listings only have a free-text location, so coordinates come from a fixed
+table of place names (no network calls): geocode() tries the whole
+location, then each comma-separated part ("Kreuzberg, Berlin, Germany" ->
+"Berlin"). More places can be added with GEOCODE_TABLE, a CSV file with
+name,latitude,longitude rows.
+
+The R*Tree index in app.py only answers "which points fall inside this
+rectangle"; bbox_around() builds the rectangle for a radius query and
+haversine_km() gives the exact distance used to refine and order the hits.
+"""
+import csv
+import math
+import os
+
+EARTH_RADIUS_KM = 6371.0088
+GEOCODE_TABLE = os.getenv('GEOCODE_TABLE')
+
+# lower-case place name -> (latitude, longitude)
+PLACES = {
+    # sample listings
+    'santorini': (36.3932, 25.4615),
+    'london': (51.5072, -0.1276),
+    'interlaken': (46.6863, 7.8632),
+    'aspen': (39.1911, -106.8175),
+    'new york': (40.7128, -74.0060),
+    'miami': (25.7617, -80.1918),
+    # Europe
+    'amsterdam': (52.3676, 4.9041),
+    'athens': (37.9838, 23.7275),
+    'barcelona': (41.3874, 2.1686),
+    'berlin': (52.5200, 13.4050),
+    'brussels': (50.8503, 4.3517),
+    'budapest': (47.4979, 19.0402),
+    'cologne': (50.9375, 6.9603),
+    'copenhagen': (55.6761, 12.5683),
+    'dublin': (53.3498, -6.2603),
+    'edinburgh': (55.9533, -3.1883),
+    'florence': (43.7696, 11.2558),
+    'frankfurt': (50.1109, 8.6821),
+    'geneva': (46.2044, 6.1432),
+    'hamburg': (53.5511, 9.9937),
+    'lisbon': (38.7223, -9.1393),
+    'lyon': (45.7640, 4.8357),
+    'madrid': (40.4168, -3.7038),
+    'manchester': (53.4808, -2.2426),
+    'marseille': (43.2965, 5.3698),
+    'milan': (45.4642, 9.1900),
+    'munich': (48.1351, 11.5820),
+    'nice': (43.7102, 7.2620),
+    'oslo': (59.9139, 10.7522),
+    'paris': (48.8566, 2.3522),
+    'prague': (50.0755, 14.4378),
+    'rome': (41.9028, 12.4964),
+    'stockholm': (59.3293, 18.0686),
+    'venice': (45.4408, 12.3155),
+    'vienna': (48.2082, 16.3738),
+    'warsaw': (52.2297, 21.0122),
+    'zurich': (47.3769, 8.5417),
+    # North America
+    'boston': (42.3601, -71.0589),
+    'chicago': (41.8781, -87.6298),
+    'los angeles': (34.0522, -118.2437),
+    'san francisco': (37.7749, -122.4194),
+    'seattle': (47.6062, -122.3321),
+    'toronto': (43.6532, -79.3832),
+    'vancouver': (49.2827, -123.1207),
+}
+
+
+def _load_table(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            PLACES[row['name'].strip().lower()] = (float(row['latitude']), float(row['longitude']))
+
+
+if GEOCODE_TABLE:
+    _load_table(GEOCODE_TABLE)
+
+
+def geocode(location):
+    """(latitude, longitude) of a free-text location, or None if no part of it is a known place."""
+    if not location:
+        return None
+    text = location.strip().lower()
+    if text in PLACES:
+        return PLACES[text]
+    for part in text.split(','):
+        point = PLACES.get(part.strip())
+        if point is not None:
+            return point
+    return None
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def bbox_around(lat, lon, radius_km):
+    """(min_lat, max_lat, min_lon, max_lon) containing every point within radius_km of (lat, lon)."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        # the circle contains a pole: every longitude
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+    # widest longitude span is at the latitude furthest from the equator
+    dlon = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(max(abs(min_lat), abs(max_lat))))))
+    if dlon >= 180 or lon - dlon < -180 or lon + dlon > 180:
+        # crosses the antimeridian; a full-width band is simpler than two rectangles
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, lon - dlon, lon + dlon
+
+
+def parse_point(text):
+    """A "lat,lon" pair or a place name -> (latitude, longitude); raises ValueError."""
+    parts = text.split(',')
+    if len(parts) == 2:
+        try:
+            lat, lon = float(parts[0]), float(parts[1])
+        except ValueError:
+            lat = lon = None
+        if lat is not None:
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                raise ValueError(f'coordinates out of range: {text!r}')
+            return lat, lon
+    point = geocode(text)
+    if point is None:
+        raise ValueError(f'unknown place: {text!r}')
+    return point
+
+
+def parse_bbox(text):
+    """"min_lon,min_lat,max_lon,max_lat" (GeoJSON order) -> (min_lat, max_lat, min_lon, max_lon); raises ValueError."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in text.split(','))
+    except ValueError:
+        raise ValueError('bbox must be min_lon,min_lat,max_lon,max_lat')
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= max_lon <= 180):
+        raise ValueError(f'invalid bbox: {text!r}')
+    return min_lat, max_lat, min_lon, max_lon
@@ -0,0 +1,25 @@
+# gunicorn settings for serving SweetHomes: gunicorn -c gunicorn.conf.py app:app
+import gc
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+
+# Import app.py once in the master instead of once per worker
+preload_app = True
+
+
+def when_ready(server):
+    from app import app, build_assets, db, preload_predictor, setup_database
+    # Create or upgrade the database once, before any worker serves a request
+    if not setup_database():
+        raise RuntimeError('database setup failed')
+    with app.app_context():
+        db.engine.dispose()  # SQLite connections must not be shared with forked workers
+    # Load the price model in the master so forked workers share its pages
+    preload_predictor()
+    # Fingerprinted CSS / JS for the workers' url_for('static', ...)
+    build_assets()
+    # Move everything loaded so far out of the GC's reach; otherwise the first
+    # collection in each worker touches every object header and un-shares the pages
+    gc.freeze()
@@ -1,92 +1,285 @@
+import os
+import time
 #pandas & numpy: data manipulation
 import pandas as pd
 import numpy as np
-#sklearn: preprocessing (scaling, encoding), model utilities
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
-#xgboost: powerful gradient boosting model for regression
-from xgboost import XGBRegressor
 
-# ============================================================
-# 1. Load Dataset the famous Ames Housing Dataset (used for house price prediction) directly from Hugging Face
-# ============================================================
-data = pd.read_csv(
+from monitoring import FeatureMonitor, training_feature_stats
+
+# sklearn and xgboost are only needed to train the model; they are imported
+# inside train_model() so that loading a saved artifact stays cheap.
+
+# Where the Ames Housing CSV is read from and where the trained model is saved
+DATA_URL = os.getenv(
+    "AMES_DATA_URL",
     "https://huggingface.co/datasets/cloderic/ames_iowa_housing/resolve/main/AmesHousing.csv"
 )
+MODEL_PATH = os.getenv(
+    "PRICE_MODEL_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "price_model.joblib")
+)
+# Lower / upper quantiles returned alongside the point prediction (p10 / p90)
+QUANTILE_ALPHAS = (0.1, 0.9)
+# How often (seconds) a serving process checks whether the saved artifact was replaced
+MODEL_RELOAD_SECONDS = float(os.getenv("MODEL_RELOAD_SECONDS", "60"))
+# Rows of the training data kept in the artifact to check refreshed models against
+REFERENCE_ROWS = 500
 
 # ============================================================
-# 2. Feature Engineering
+# 1. Load Dataset the famous Ames Housing Dataset (used for house price prediction) directly from Hugging Face
 # ============================================================
-data['HouseAge'] = data['yr_sold'] - data['year_built']
-data['RemodelAge'] = data['yr_sold'] - data['year_remod_add']
-data['TotalBath'] = data['full_bath'] + 0.5 * data['half_bath']
-data['TotalSF'] = data['gr_liv_area'] + data['total_bsmt_sf']
-data['OverallQual_GrLivArea'] = data['overall_qual'] * data['gr_liv_area']
+def load_data(source=DATA_URL):
+    data = pd.read_csv(source)
+
+    # ============================================================
+    # 2. Feature Engineering
+    # ============================================================
+    data['HouseAge'] = data['yr_sold'] - data['year_built']
+    data['RemodelAge'] = data['yr_sold'] - data['year_remod_add']
+    data['TotalBath'] = data['full_bath'] + 0.5 * data['half_bath']
+    data['TotalSF'] = data['gr_liv_area'] + data['total_bsmt_sf']
+    data['OverallQual_GrLivArea'] = data['overall_qual'] * data['gr_liv_area']
+    return data
+
+
+def train_model(data):
+    """
+    Fit the preprocessing pipeline and the XGBoost model on `data`.
+    Returns the artifact dict that predict_price() serves from.
+    """
+    #sklearn: preprocessing (scaling, encoding), model utilities
+    from sklearn.preprocessing import StandardScaler, OneHotEncoder
+    from sklearn.compose import ColumnTransformer
+    #xgboost: powerful gradient boosting model for regression
+    from xgboost import XGBRegressor
+
+    # ============================================================
+    # 3. Features / Target
+    # ============================================================
+    #X: all columns except price
+    X = data.drop("saleprice", axis=1)
+    #y: log-transformed sale price (common practice to stabilize variance and improve model performance)
+    y = np.log1p(data["saleprice"])
+
+    # Column types
+    #Automatically detects which columns are numeric vs categorical (strings)
+    numeric_cols = X.select_dtypes(include=["int64", "float64"]).columns
+    categorical_cols = X.select_dtypes(include=["object"]).columns
+
+    # ============================================================
+    # 4. Preprocessing Pipeline
+    # ============================================================
+    # Numeric: Standard Scaling
+    #Scales numeric features (mean=0, std=1)
+    numeric_transformer = StandardScaler()
+    # Categorical: One-Hot Encoding
+    #Encodes categorical features as one-hot vectors
+    categorical_transformer = OneHotEncoder(handle_unknown='ignore', sparse_output=False)
+
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ('num', numeric_transformer, numeric_cols),
+            ('cat', categorical_transformer, categorical_cols)
+        ]
+    )
+    # Fit and transform the data
+    # Output: preprocessed feature matrix
+    # Outputs dense NumPy array (not sparse)
+    X_preprocessed = preprocessor.fit_transform(X)
+
+    # ============================================================
+    # 5. Train Model
+    # ============================================================
+    xgb_model = XGBRegressor(
+        #tree parameters
+        n_estimators=800,
+        #learning parameters (slow learning rate for better performance)
+        learning_rate=0.03,
+        #regularization parameters (reg_alpha, reg_lambda) prevents overfitting
+        max_depth=6,
+        #Subsampling reduces variance
+        subsample=0.85,
+        #Feature subsampling (colsample_bytree) reduces correlation between trees
+        colsample_bytree=0.85,
+        #regularization terms (L1 and L2)
+        reg_alpha=0.5,
+        reg_lambda=1.0,
+        #Loss function for regression
+        objective='reg:squarederror',
+        #Random seed for reproducibility
+        random_state=42
+    )
+    #Train model
+    #Trained on log(price), so predictions will be in log scale
+    xgb_model.fit(X_preprocessed, y)
+
+    # ============================================================
+    # 5b. Train Quantile Model (price range)
+    # ============================================================
+    #One multi-output booster predicts every alpha in QUANTILE_ALPHAS at once
+    #Quantiles survive the log transform, so expm1 of a log-quantile is a price quantile
+    quantile_model = XGBRegressor(
+        #fewer, shallower trees: the range only needs to be roughly right and cheap to evaluate
+        n_estimators=300,
+        learning_rate=0.05,
+        max_depth=4,
+        subsample=0.85,
+        colsample_bytree=0.85,
+        objective='reg:quantileerror',
+        quantile_alpha=np.array(QUANTILE_ALPHAS),
+        random_state=42
+    )
+    quantile_model.fit(X_preprocessed, y)
+
+    #Keep a fixed sample of the training matrix so incremental refreshes can be
+    #checked for regressions on the original distribution without reloading the CSV
+    reference = np.random.default_rng(42).choice(len(y), size=min(REFERENCE_ROWS, len(y)), replace=False)
+
+    # Only the column layout is kept, not the training DataFrame itself
+    return {
+        "reference": {"X": X_preprocessed[reference], "y": y.to_numpy()[reference]},
+        #Training distribution of each input, compared against live inputs by the drift monitor
+        "feature_stats": training_feature_stats(X, numeric_cols, categorical_cols),
+        "watermark": None,
+        "preprocessor": preprocessor,
+        "model": xgb_model,
+        "quantile_model": quantile_model,
+        "quantile_alphas": list(QUANTILE_ALPHAS),
+        "columns": list(X.columns),
+        "numeric_cols": list(numeric_cols),
+        "categorical_cols": list(categorical_cols),
+    }
+
 
 # ============================================================
-# 3. Features / Target
+# 6. Save / Load the trained artifact
 # ============================================================
-#X: all columns except price
-X = data.drop("saleprice", axis=1)
-#y: log-transformed sale price (common practice to stabilize variance and improve model performance)
-y = np.log1p(data["saleprice"])
+def save_model(artifact, path=MODEL_PATH):
+    import joblib
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temp file first so readers never see a half-written artifact
+    tmp_path = path + ".tmp"
+    joblib.dump(artifact, tmp_path)
+    os.replace(tmp_path, path)
+
+
+_artifact = None
+_artifact_mtime = None
+_last_check = 0.0
+# Input statistics for the currently loaded artifact (see monitoring.py)
+monitor = None
+def load_model(path=MODEL_PATH):
+    """
+    Return the trained artifact, loading it from disk once per process.
+    If no artifact has been saved yet, train one and save it.
+    Every MODEL_RELOAD_SECONDS the file is re-checked, so an artifact swapped
+    in by refresh_model() is picked up without restarting the server.
+    """
+    global _artifact, _artifact_mtime, _last_check, monitor
+    now = time.monotonic()
+    if _artifact is not None and now - _last_check < MODEL_RELOAD_SECONDS:
+        return _artifact
+    _last_check = now
+    if os.path.exists(path):
+        mtime = os.stat(path).st_mtime_ns
+        if mtime != _artifact_mtime:
+            import joblib
+            _artifact = joblib.load(path)
+            _artifact_mtime = mtime
+            monitor = FeatureMonitor.from_artifact(_artifact)
+    elif _artifact is None:
+        _artifact = train_model(load_data())
+        save_model(_artifact, path)
+        _artifact_mtime = os.stat(path).st_mtime_ns
+        monitor = FeatureMonitor.from_artifact(_artifact)
+    return _artifact
+
+
+def drift_report():
+    """
+    Input statistics of this process vs. the training data (see monitoring.py).
+    Only reads a model that is already loaded or saved: a scrape must never
+    trigger training, so with no model yet the report is empty.
+    """
+    if _artifact is None and not os.path.exists(MODEL_PATH):
+        return FeatureMonitor([]).drift_report()
+    load_model()
+    return monitor.drift_report()
 
-# Column types
-#Automatically detects which columns are numeric vs categorical (strings)
-numeric_cols = X.select_dtypes(include=["int64", "float64"]).columns
-categorical_cols = X.select_dtypes(include=["object"]).columns
 
 # ============================================================
-# 4. Preprocessing Pipeline
+# 7. PREDICTION FUNCTION (USED BY FLASK)
 # ============================================================
-# Numeric: Standard Scaling
-#Scales numeric features (mean=0, std=1)
-numeric_transformer = StandardScaler()
-# Categorical: One-Hot Encoding
-#Encodes categorical features as one-hot vectors
-categorical_transformer = OneHotEncoder(handle_unknown='ignore', sparse_output=False)
-
-preprocessor = ColumnTransformer(
-    transformers=[
-        ('num', numeric_transformer, numeric_cols),
-        ('cat', categorical_transformer, categorical_cols)
+def _default_row(artifact):
+    # Empty row with correct columns: categorical defaults "None", numeric defaults 0.0
+    row = dict.fromkeys(artifact["columns"], 0)
+    for col in artifact["categorical_cols"]:
+        row[col] = "None"
+    for col in artifact["numeric_cols"]:
+        row[col] = 0.0
+    return row
+
+
+_warned_keys = set()
+def _preprocess(artifact, input_dicts, observe=True):
+    defaults = _default_row(artifact)
+
+    rows = []
+    for input_dict in input_dicts:
+        if observe:
+            monitor.observe(input_dict)
+        row = dict(defaults)
+        # Apply user values
+        for key, value in input_dict.items():
+            if key in row:
+                row[key] = value
+            elif key not in _warned_keys and len(_warned_keys) < 100:
+                # later occurrences are only counted by the drift monitor
+                _warned_keys.add(key)
+                print(f"[WARNING] Column '{key}' not in dataset")
+        rows.append(row)
+
+    # Preprocess rows
+    return artifact["preprocessor"].transform(pd.DataFrame(rows, columns=artifact["columns"]))
+
+
+def predict_prices(input_dicts):
+    """
+    Batched version of predict_price(): one preprocess + one model call
+    for the whole list. Returns a list of floats in the same order.
+    """
+    artifact = load_model()
+    processed = _preprocess(artifact, input_dicts)
+
+    # Predict
+    log_prices = artifact["model"].predict(processed)
+    return [float(price) for price in np.expm1(log_prices)]
+
+
+def predict_price_ranges(input_dicts):
+    """
+    Like predict_prices(), but each result is a dict with the point price
+    and the p10 / p90 range: {"price": ..., "p10": ..., "p90": ...}.
+    The range is None for artifacts saved before the quantile model existed.
+    """
+    artifact = load_model()
+    processed = _preprocess(artifact, input_dicts)
+
+    prices = np.expm1(artifact["model"].predict(processed))
+    if artifact.get("quantile_model") is None:
+        return [{"price": float(price), "p10": None, "p90": None} for price in prices]
+
+    # shape (n_rows, n_alphas); sort each row so the quantiles never cross
+    quantiles = np.sort(np.expm1(artifact["quantile_model"].predict(processed)).reshape(len(prices), -1), axis=1)
+    # keep the point prediction inside its own range
+    low = np.minimum(quantiles[:, 0], prices)
+    high = np.maximum(quantiles[:, -1], prices)
+    return [
+        {"price": float(price), "p10": float(lo), "p90": float(hi)}
+        for price, lo, hi in zip(prices, low, high)
     ]
-)
-# Fit and transform the data
-# Output: preprocessed feature matrix
-# Outputs dense NumPy array (not sparse)
-X_preprocessed = preprocessor.fit_transform(X)
 
-# ============================================================
-# 5. Train Model
-# ============================================================
-xgb_model = XGBRegressor(
-    #tree parameters
-    n_estimators=800,
-    #learning parameters (slow learning rate for better performance)
-    learning_rate=0.03,
-    #regularization parameters (reg_alpha, reg_lambda) prevents overfitting
-    max_depth=6,
-    #Subsampling reduces variance
-    subsample=0.85,
-    #Feature subsampling (colsample_bytree) reduces correlation between trees
-    colsample_bytree=0.85,
-    #regularization terms (L1 and L2)
-    reg_alpha=0.5,
-    reg_lambda=1.0,
-    #Loss function for regression
-    objective='reg:squarederror',
-    #Random seed for reproducibility
-    random_state=42
-)
-#Train model
-#Trained on log(price), so predictions will be in log scale
-xgb_model.fit(X_preprocessed, y)
 
-# ============================================================
-# 6. PREDICTION FUNCTION (USED BY FLASK)
-# ============================================================
 #Core function used by Flask app to predict price from form input
 def predict_price(input_dict):
     """
@@ -99,31 +292,76 @@ def predict_price(input_dict):
         ...
       }
     """
+    return predict_prices([input_dict])[0]
 
-    # Create an empty row with correct columns
-    row = pd.DataFrame(columns=X.columns)
-    row.loc[0] = 0
 
-    # Fill categorical defaults
-    for col in categorical_cols:
-        row[col] = "None"
+def predict_price_range(input_dict):
+    """Single-row predict_price_ranges()."""
+    return predict_price_ranges([input_dict])[0]
 
-    # Fill numeric defaults
-    for col in numeric_cols:
-        row[col] = 0.0
 
-    # Apply user values
-    for key, value in input_dict.items():
-        if key in row.columns:
-            row.at[0, key] = value
-        else:
-            print(f"[WARNING] Column '{key}' not in dataset")
+# ============================================================
+# 8. INCREMENTAL REFRESH (continue boosting on new listings)
+# ============================================================
+def _rmse(model, X, y):
+    return float(np.sqrt(np.mean((model.predict(X) - y) ** 2)))
 
-    # Preprocess row
-    processed = preprocessor.transform(row)
 
-    # Predict
-    log_price = xgb_model.predict(processed)[0]
-    price = np.expm1(log_price)
+def refresh_model(artifact, input_dicts, prices, n_rounds=50, holdout_fraction=0.2, tolerance=0.02,
+                  max_reference_drift=0.25):
+    """
+    Continue boosting the artifact's models for `n_rounds` extra trees on new
+    rows (feature dicts + sale prices) instead of retraining from scratch.
+    The preprocessor is left as-is, so cost depends only on the new rows.
+
+    A share of the new rows is held out: the refreshed model is rejected if
+    its RMSE there is worse than the current one by more than `tolerance`,
+    or if its RMSE on the stored reference sample of the original training
+    data grows by more than `max_reference_drift`.
+    Returns (new_artifact or None, report dict).
+    """
+    from xgboost import XGBRegressor
+
+    X_new = _preprocess(artifact, input_dicts, observe=False)
+    y_new = np.log1p(np.asarray(prices, dtype=float))
+
+    order = np.random.default_rng(42).permutation(len(y_new))
+    n_holdout = max(1, int(len(y_new) * holdout_fraction))
+    holdout, train = order[:n_holdout], order[n_holdout:]
+
+    def _continue(model):
+        # Same hyperparameters, n_rounds more trees on top of the existing booster
+        refreshed = XGBRegressor(**model.get_params())
+        refreshed.set_params(n_estimators=n_rounds)
+        refreshed.fit(X_new[train], y_new[train], xgb_model=model.get_booster())
+        return refreshed
+
+    model = _continue(artifact["model"])
+    report = {
+        "rows": len(y_new),
+        "holdout_rows": n_holdout,
+        "holdout_rmse_before": _rmse(artifact["model"], X_new[holdout], y_new[holdout]),
+        "holdout_rmse_after": _rmse(model, X_new[holdout], y_new[holdout]),
+    }
+    accepted = report["holdout_rmse_after"] <= report["holdout_rmse_before"] * (1 + tolerance)
+    reference = artifact.get("reference")
+    if reference is not None:
+        report["reference_rmse_before"] = _rmse(artifact["model"], reference["X"], reference["y"])
+        report["reference_rmse_after"] = _rmse(model, reference["X"], reference["y"])
+        accepted = accepted and (
+            report["reference_rmse_after"] <= report["reference_rmse_before"] * (1 + max_reference_drift)
+        )
+    if not accepted:
+        return None, report
+
+    refreshed = dict(artifact, model=model)
+    if artifact.get("quantile_model") is not None:
+        refreshed["quantile_model"] = _continue(artifact["quantile_model"])
+    return refreshed, report
+
 
-    return float(price)
+if __name__ == "__main__":
+    # Retrain from the CSV and overwrite the saved artifact
+    artifact = train_model(load_data())
+    save_model(artifact)
+    print(f"Model saved to {MODEL_PATH}")
@@ -0,0 +1,50 @@
+"""
+Quantile sketch for the per-location / per-property-type price statistics.
+
+Prices are counted in logarithmic buckets (the DDSketch scheme): any value
+in a bucket is within RELATIVE_ACCURACY of the bucket's estimate, so the
+median and p90 read from the sketch are accurate to 1%. Unlike most
+streaming sketches, a bucket count can simply be decremented, which lets a
+deleted listing be removed again. The sketch is a plain {bucket: count}
+dict so it can be stored as JSON next to the other aggregates.
+"""
+import math
+
+RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+def bucket(value):
+    """Bucket index of a positive value."""
+    return math.ceil(math.log(value) / _LOG_GAMMA)
+
+
+def bucket_value(index):
+    """Estimate for every value in bucket `index` (within RELATIVE_ACCURACY of all of them)."""
+    return 2 * _GAMMA ** index / (_GAMMA + 1)
+
+
+def add(sketch, value, count=1):
+    """Add `count` occurrences of `value` (negative count removes them). Empty buckets are dropped."""
+    key = str(bucket(value))
+    new = sketch.get(key, 0) + count
+    if new > 0:
+        sketch[key] = new
+    else:
+        sketch.pop(key, None)
+
+
+def quantile(sketch, q):
+    """Approximate q-quantile (0 <= q <= 1), or None for an empty sketch."""
+    buckets = sorted((int(key), count) for key, count in sketch.items())
+    total = sum(count for _, count in buckets)
+    if not total:
+        return None
+    rank = q * (total - 1)
+    seen = 0
+    for index, count in buckets:
+        seen += count
+        if seen > rank:
+            return bucket_value(index)
+    return bucket_value(buckets[-1][0])
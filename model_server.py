@@ -0,0 +1,214 @@
+"""
+Standalone price-model server.
+
+One process loads the model and answers prediction requests from the Flask
+workers over a local socket, so the workers never hold their own copy of the
+booster and preprocessor. Requests that arrive close together are merged into
+a single batched model call.
+
+Run it next to gunicorn:
+    python model_server.py
+and point the app at it with MODEL_SERVER_ADDRESS (same value on both sides).
+Both sides must also share a secret in MODEL_SERVER_AUTHKEY: the protocol
+unpickles what it receives, so only authenticated peers may connect.
+"""
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+# Unix socket in the app's instance folder (not a world-writable dir like /tmp) unless set
+MODEL_SERVER_ADDRESS = os.getenv('MODEL_SERVER_ADDRESS', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'instance', 'model-server.sock'))
+MODEL_SERVER_AUTHKEY = os.getenv('MODEL_SERVER_AUTHKEY', '').encode()
+# Micro-batching limits: flush when this many rows are queued, or when the
+# oldest queued request has waited this long
+MODEL_BATCH_SIZE = int(os.getenv('MODEL_BATCH_SIZE', '64'))
+MODEL_BATCH_WAIT_MS = float(os.getenv('MODEL_BATCH_WAIT_MS', '2'))
+# Longest a request waits for its prediction (client and server side); past
+# this the client gives up and the app falls back to its in-process estimate
+MODEL_SERVER_TIMEOUT = float(os.getenv('MODEL_SERVER_TIMEOUT', '10'))
+
+
+def _parse_address(address):
+    # "host:port" means TCP, anything else is a Unix socket path
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return (host or '127.0.0.1', int(port)), 'AF_INET'
+    return address, 'AF_UNIX'
+
+
+def _require_authkey(authkey):
+    # no built-in default: a key shipped with the code would let anyone who
+    # reaches the socket send pickles, i.e. run code in the model server
+    if not authkey:
+        raise RuntimeError('MODEL_SERVER_AUTHKEY must be set (the same secret for the server and the app)')
+    return authkey
+
+
+class _Pending:
+    """One client request waiting in the batch queue."""
+    def __init__(self, rows):
+        self.rows = rows
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class ModelServer:
+    def __init__(self, predict_batch, address=MODEL_SERVER_ADDRESS, authkey=MODEL_SERVER_AUTHKEY,
+                 max_batch_size=MODEL_BATCH_SIZE, max_wait_ms=MODEL_BATCH_WAIT_MS, drift_report=None,
+                 timeout=MODEL_SERVER_TIMEOUT):
+        self.predict_batch = predict_batch
+        self.drift_report = drift_report
+        self.address = address
+        self.authkey = _require_authkey(authkey)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+        self._queue = queue.Queue()
+
+    def serve_forever(self):
+        address, family = _parse_address(self.address)
+        if family == 'AF_UNIX':
+            os.makedirs(os.path.dirname(address) or '.', exist_ok=True)
+            if os.path.exists(address):
+                os.remove(address)  # stale socket from a previous run
+        threading.Thread(target=self._batch_loop, daemon=True).start()
+        with Listener(address, family=family, authkey=self.authkey) as listener:
+            if family == 'AF_UNIX':
+                os.chmod(address, 0o600)  # only this user's processes may connect
+            print(f"Model server listening on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    # failed handshake (wrong authkey etc.) - keep serving
+                    print(f"Model server: rejected connection: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        # One thread per worker connection: recv a request, wait for the
+        # batcher to fill in the result, send it back.
+        # Requests are ('predict', rows) or ('drift_report', None).
+        with conn:
+            while True:
+                try:
+                    op, rows = conn.recv()
+                except EOFError:
+                    return
+                if op == 'drift_report':
+                    try:
+                        conn.send(('ok', self.drift_report()))
+                    except Exception as e:
+                        conn.send(('error', str(e)))
+                    continue
+                pending = _Pending(rows)
+                self._queue.put(pending)
+                if not pending.done.wait(self.timeout):
+                    conn.send(('error', f'no prediction within {self.timeout:g} s'))
+                elif pending.error is not None:
+                    conn.send(('error', pending.error))
+                else:
+                    conn.send(('ok', pending.result))
+
+    def _batch_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                self._collect_and_predict(batch)
+            except Exception as e:
+                # never let the batcher thread die: fail whatever is still waiting
+                print(f"Model server: batch failed: {e}")
+                for pending in batch:
+                    if not pending.done.is_set():
+                        pending.error = str(e)
+                        pending.done.set()
+
+    def _collect_and_predict(self, batch):
+        # wait up to max_wait for more requests to merge, then run them as one model call
+        n_rows = len(batch[0].rows)
+        deadline = time.monotonic() + self.max_wait
+        while n_rows < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(pending)
+            n_rows += len(pending.rows)
+
+        self._predict(batch)
+
+    def _predict(self, batch):
+        rows = [row for pending in batch for row in pending.rows]
+        try:
+            results = self.predict_batch(rows)
+            if len(results) != len(rows):
+                raise ValueError(f'model returned {len(results)} results for {len(rows)} rows')
+        except Exception as e:
+            if len(batch) > 1:
+                # one malformed request must not fail the others merged with it:
+                # run each on its own so only the bad one gets the error
+                for pending in batch:
+                    self._predict([pending])
+                return
+            batch[0].error = str(e)
+            batch[0].done.set()
+            return
+
+        offset = 0
+        for pending in batch:
+            pending.result = results[offset:offset + len(pending.rows)]
+            offset += len(pending.rows)
+            pending.done.set()
+
+
+class ModelClient:
+    """
+    Client used by the Flask workers. Keeps one connection per thread and
+    reconnects on the next call if the server went away.
+    """
+    def __init__(self, address=MODEL_SERVER_ADDRESS, authkey=MODEL_SERVER_AUTHKEY, timeout=MODEL_SERVER_TIMEOUT):
+        self.address, self.family = _parse_address(address)
+        self.authkey = _require_authkey(authkey)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _call(self, op, payload=None):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = Client(self.address, family=self.family, authkey=self.authkey)
+            self._local.conn = conn
+        try:
+            conn.send((op, payload))
+            if not conn.poll(self.timeout):
+                # a late reply would be read as the answer to the next request: drop the connection
+                raise TimeoutError(f'no reply from the model server within {self.timeout:g} s')
+            status, payload = conn.recv()
+        except (EOFError, OSError):
+            self._local.conn = None
+            conn.close()
+            raise
+        if status != 'ok':
+            raise RuntimeError(f"Model server error: {payload}")
+        return payload
+
+    def predict_many(self, rows):
+        return self._call('predict', list(rows))
+
+    def predict_one(self, features):
+        return self.predict_many([features])[0]
+
+    def drift_report(self):
+        return self._call('drift_report')
+
+
+if __name__ == '__main__':
+    import houseprice
+    houseprice.load_model()
+    ModelServer(houseprice.predict_price_ranges, drift_report=houseprice.drift_report).serve_forever()
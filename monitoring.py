@@ -0,0 +1,176 @@
+"""
+Streaming statistics on the inputs that reach the price model.
+
+FeatureMonitor keeps, in fixed memory, a running mean/variance and a
+histogram per numeric feature (bins = training deciles) and counts of
+categories the model never saw in training. drift_report() compares them
+with the training statistics saved in the model artifact, and
+render_metrics() turns a report into Prometheus text format.
+"""
+import bisect
+import math
+import threading
+
+# Distinct unknown keys / categories remembered by name; the rest only add to the totals
+MAX_TRACKED_VALUES = 20
+
+
+def training_feature_stats(X, numeric_cols, categorical_cols):
+    """Per-feature training statistics stored in the model artifact (called from houseprice.train_model)."""
+    import numpy as np
+    stats = {}
+    for col in numeric_cols:
+        values = X[col].dropna().to_numpy(dtype=float)
+        # decile edges; duplicates dropped for low-cardinality columns
+        edges = np.unique(np.quantile(values, np.linspace(0.1, 0.9, 9)))
+        counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+        stats[col] = {
+            'kind': 'numeric',
+            'mean': float(values.mean()),
+            'std': float(values.std()),
+            'edges': edges.tolist(),
+            'hist': (counts / max(len(values), 1)).tolist(),
+        }
+    for col in categorical_cols:
+        stats[col] = {'kind': 'categorical', 'categories': sorted(X[col].dropna().astype(str).unique())}
+    return stats
+
+
+def _bump(counter, key, amount=1):
+    # Count `key` by name while there is room, always count it in '_total'
+    counter['_total'] = counter.get('_total', 0) + amount
+    if key in counter or len(counter) <= MAX_TRACKED_VALUES:
+        counter[key] = counter.get(key, 0) + amount
+
+
+def _psi(observed, expected, eps=1e-4):
+    """Population stability index between two histograms of the same bins."""
+    total = sum(observed)
+    if not total:
+        return None
+    psi = 0.0
+    for count, e in zip(observed, expected):
+        o = max(count / total, eps)
+        e = max(e, eps)
+        psi += (o - e) * math.log(o / e)
+    return psi
+
+
+class FeatureMonitor:
+    """Fixed-memory input statistics for one model artifact. Thread-safe."""
+
+    def __init__(self, columns, feature_stats=None):
+        self.columns = frozenset(columns)
+        self.training = feature_stats or {}
+        self._categories = {
+            name: frozenset(stats['categories'])
+            for name, stats in self.training.items() if stats['kind'] == 'categorical'
+        }
+        self._lock = threading.Lock()
+        self.predictions = 0
+        # numeric feature -> [count, mean, m2, min, max, histogram, training bin edges]
+        self._numeric = {}
+        # categorical feature -> [count, {unknown value: count}]
+        self._categorical = {}
+        self._unknown_keys = {}
+
+    @classmethod
+    def from_artifact(cls, artifact):
+        return cls(artifact['columns'], artifact.get('feature_stats'))
+
+    def observe(self, input_dict):
+        """Record one prediction's inputs. Only the keys present are touched."""
+        columns, categories_of, numeric = self.columns, self._categories, self._numeric
+        with self._lock:
+            self.predictions += 1
+            for key, value in input_dict.items():
+                acc = numeric.get(key)
+                if acc is None:
+                    if key not in columns:
+                        _bump(self._unknown_keys, key)
+                        continue
+                    categories = categories_of.get(key)
+                    if categories is not None or (key not in self.training and isinstance(value, str)):
+                        self._observe_category(key, value, categories)
+                        continue
+                try:
+                    x = float(value)
+                except (TypeError, ValueError):
+                    continue
+                if acc is None:
+                    edges = self.training.get(key, {}).get('edges', [])
+                    acc = numeric[key] = [0, 0.0, 0.0, x, x, [0] * (len(edges) + 1), edges]
+                # Welford's running mean / variance
+                acc[0] += 1
+                delta = x - acc[1]
+                acc[1] += delta / acc[0]
+                acc[2] += delta * (x - acc[1])
+                if x < acc[3]:
+                    acc[3] = x
+                elif x > acc[4]:
+                    acc[4] = x
+                acc[5][bisect.bisect_right(acc[6], x)] += 1
+
+    def _observe_category(self, key, value, categories):
+        acc = self._categorical.get(key)
+        if acc is None:
+            acc = self._categorical[key] = [0, {}]
+        acc[0] += 1
+        if categories is not None and str(value) not in categories:
+            _bump(acc[1], str(value))
+
+    def drift_report(self):
+        """Live statistics per feature next to the training statistics they drifted from."""
+        with self._lock:
+            features = {}
+            for name, (count, mean, m2, lo, hi, hist, _) in self._numeric.items():
+                std = math.sqrt(m2 / count) if count else 0.0
+                entry = {'kind': 'numeric', 'count': count, 'missing': self.predictions - count,
+                         'mean': mean, 'std': std, 'min': lo, 'max': hi}
+                train = self.training.get(name)
+                if train:
+                    entry['training_mean'] = train['mean']
+                    entry['training_std'] = train['std']
+                    # shift of the live mean, in training standard deviations
+                    entry['mean_shift'] = (mean - train['mean']) / train['std'] if train['std'] else None
+                    entry['psi'] = _psi(hist, train['hist']) if len(hist) > 1 else None
+                features[name] = entry
+            for name, (count, unknown) in self._categorical.items():
+                features[name] = {'kind': 'categorical', 'count': count, 'missing': self.predictions - count,
+                                  'unknown': unknown.get('_total', 0),
+                                  'unknown_values': {k: v for k, v in unknown.items() if k != '_total'}}
+            return {
+                'predictions': self.predictions,
+                'training_stats': bool(self.training),
+                'unknown_keys': {k: v for k, v in self._unknown_keys.items() if k != '_total'},
+                'unknown_keys_total': self._unknown_keys.get('_total', 0),
+                'features': features,
+            }
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_metrics(report):
+    """Prometheus text exposition of a drift_report()."""
+    lines = [
+        '# TYPE price_predictions_total counter',
+        f"price_predictions_total {report['predictions']}",
+        '# TYPE price_unknown_keys_total counter',
+        f"price_unknown_keys_total {report['unknown_keys_total']}",
+    ]
+    series = [
+        ('price_feature_observations_total', 'counter', 'count'),
+        ('price_feature_mean', 'gauge', 'mean'),
+        ('price_feature_std', 'gauge', 'std'),
+        ('price_feature_mean_shift', 'gauge', 'mean_shift'),
+        ('price_feature_psi', 'gauge', 'psi'),
+        ('price_feature_unknown_categories_total', 'counter', 'unknown'),
+    ]
+    for metric, metric_type, field in series:
+        lines.append(f'# TYPE {metric} {metric_type}')
+        for name, entry in sorted(report['features'].items()):
+            if entry.get(field) is not None:
+                lines.append(f'{metric}{{feature="{_label(name)}"}} {entry[field]}')
+    return '\n'.join(lines) + '\n'
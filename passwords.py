@@ -0,0 +1,89 @@
+"""
+Password hashing off the request thread.
+
+Hashes are computed in a small dedicated pool (threads by default:
+hashlib's PBKDF2 and scrypt release the GIL; or processes) with a cap on
+how many hashes may be queued or running at once. When a login storm
+fills that cap, further attempts fail fast with HashingBusy instead of
+piling up behind each other and starving page requests of CPU.
+
+The work factor comes from PASSWORD_HASH_METHOD (any Werkzeug method
+string, e.g. "pbkdf2:sha256:600000" or "scrypt:32768:8:1"); needs_rehash()
+tells the login route when a stored hash was made with different settings.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}')
+PASSWORD_HASH_EXECUTOR = os.getenv('PASSWORD_HASH_EXECUTOR', 'thread')  # 'thread' or 'process'
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+# hashes allowed to be running or waiting per pool before new ones are refused
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', '8'))
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))
+
+
+class HashingBusy(Exception):
+    """Too many password hashes already queued; try again later."""
+
+
+def _method_key(method):
+    # "pbkdf2", "pbkdf2:sha256" and "pbkdf2:sha256:<default>" are the same settings
+    parts = method.split(':')
+    if parts[0] == 'pbkdf2':
+        parts += ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)][len(parts) - 1:]
+    elif parts[0] == 'scrypt' and len(parts) == 1:
+        parts += ['32768', '8', '1']
+    return ':'.join(parts)
+
+
+class PasswordHasher:
+    def __init__(self, method=PASSWORD_HASH_METHOD, executor=PASSWORD_HASH_EXECUTOR,
+                 workers=PASSWORD_HASH_WORKERS, max_pending=PASSWORD_HASH_MAX_PENDING,
+                 timeout=PASSWORD_HASH_TIMEOUT):
+        self.method = method
+        self.executor_type = executor
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        # Created lazily, and again after a fork: pools do not survive fork
+        with self._pool_lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                pool_class = ProcessPoolExecutor if self.executor_type == 'process' else ThreadPoolExecutor
+                self._pool = pool_class(max_workers=self.workers)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = self._get_pool().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # the slot is held until the hash actually finishes, even if we stop waiting for it
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HashingBusy()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return _method_key(password_hash.split('$', 1)[0]) != _method_key(self.method)
+
+
+hasher = PasswordHasher()
@@ -0,0 +1,111 @@
+"""
+Map search benchmark: the house_geo R*Tree vs. a full scan and vs. a plain
+B-tree on latitude, over synthetic listings (80% clustered around the
+geo.PLACES cities, 20% uniform over Europe) in a throwaway database:
+
+    python scripts/bench_geo_search.py [--rows 1000000] [--queries 30]
+
+Every radius query is first checked against the brute-force result.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=30, help='query centers per measurement')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    # must be set before app is imported
+    os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='sweethomes-bench-'), 'houses.db')
+    os.environ.setdefault('FLASK_SECRET_KEY', 'bench')
+    sys.path.insert(0, ROOT)
+    import app as A
+    import geo
+    from sqlalchemy import insert, text
+
+    random.seed(args.seed)
+    cities = list(geo.PLACES.values())
+
+    def point(i):
+        if i % 5:
+            lat, lon = random.choice(cities)
+            return lat + random.gauss(0, 0.15), lon + random.gauss(0, 0.2)
+        return random.uniform(35, 60), random.uniform(-10, 30)
+
+    with A.app.app_context():
+        A.db.create_all()
+        A.ensure_geo_index()
+        session = A.db.session
+        start = time.perf_counter()
+        for offset in range(0, args.rows, 10000):
+            rows = []
+            for i in range(offset, min(offset + 10000, args.rows)):
+                lat, lon = point(i)
+                rows.append({'title': 'p', 'price': '100000', 'location': 'x', 'latitude': lat, 'longitude': lon})
+            session.execute(insert(A.House), rows)
+        session.commit()
+        print(f"insert {args.rows:,} rows (R*Tree kept by triggers): {time.perf_counter() - start:.1f} s")
+
+        centers = [random.choice(cities) for _ in range(args.queries)]
+
+        def scan(center, radius):
+            # no spatial index: haversine over every row
+            lat0, lon0 = center
+            hits = [(geo.haversine_km(lat0, lon0, lat, lon), house_id) for house_id, lat, lon in session.execute(
+                text('SELECT id, latitude, longitude FROM house WHERE latitude IS NOT NULL'))]
+            return [house_id for distance, house_id in sorted(hits) if distance <= radius][:A.GEO_SEARCH_MAX_RESULTS]
+
+        def btree(center, radius):
+            # B-tree on latitude only, then the same refinement
+            min_lat, max_lat, min_lon, max_lon = geo.bbox_around(*center, radius)
+            lat0, lon0 = center
+            hits = [(geo.haversine_km(lat0, lon0, lat, lon), house_id) for house_id, lat, lon in session.execute(
+                text('SELECT id, latitude, longitude FROM house WHERE latitude BETWEEN :a AND :b '
+                     'AND longitude BETWEEN :c AND :d'), {'a': min_lat, 'b': max_lat, 'c': min_lon, 'd': max_lon})]
+            return [house_id for distance, house_id in sorted(hits) if distance <= radius][:A.GEO_SEARCH_MAX_RESULTS]
+
+        def rtree(center, radius):
+            return [house_id for house_id, _ in A.geo_search(geo.bbox_around(*center, radius), center, radius)]
+
+        def timed(fn, radius, n):
+            times = []
+            for center in centers[:n]:
+                start = time.perf_counter()
+                fn(center, radius)
+                times.append((time.perf_counter() - start) * 1000)
+            return statistics.median(times), max(times)
+
+        for radius in (1, 5, 25):
+            assert rtree(centers[0], radius) == scan(centers[0], radius), f'R*Tree result differs at {radius} km'
+            hits = len(A.geo_search(geo.bbox_around(*centers[0], radius), centers[0], radius, limit=10 ** 9))
+            p50, worst = timed(rtree, radius, args.queries)
+            print(f"R*Tree radius {radius:>2} km (~{hits:,} hits): p50 {p50:.2f} ms, max {worst:.2f} ms")
+        p50, _ = timed(scan, 5, 3)
+        print(f"full scan + haversine 5 km: p50 {p50:.0f} ms")
+        session.execute(text('CREATE INDEX ix_bench_latitude ON house (latitude)'))
+        session.commit()
+        p50, worst = timed(btree, 5, args.queries)
+        print(f"B-tree(latitude) + bbox 5 km: p50 {p50:.1f} ms, max {worst:.1f} ms")
+
+        rect = geo.parse_bbox('13.2,52.4,13.6,52.6')  # Berlin viewport
+        times = []
+        for _ in range(10):
+            start = time.perf_counter()
+            found = len(A.geo_search(rect, ((rect[0] + rect[1]) / 2, (rect[2] + rect[3]) / 2)))
+            times.append((time.perf_counter() - start) * 1000)
+        print(f"Berlin viewport bbox: {found} results (limit {A.GEO_SEARCH_MAX_RESULTS}), "
+              f"p50 {statistics.median(times):.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Login storm against the bounded password-hashing pool (passwords.py).
+
+Starts gunicorn (gthread) on a throwaway database for each scenario, has
+CLIENTS threads POST /login as fast as they can for DURATION seconds (pausing
+BACKOFF seconds after a 503, as a client told to try again would), and
+meanwhile polls /market-stats from a separate process to see what the storm
+does to ordinary page latency:
+
+    python scripts/bench_login_storm.py [--duration 15] [--clients 24] [--backoff 1] [--cpus 0]
+
+Scenarios: quiet (no storm), unbounded (64 hash workers, no queue cap) and
+pooled (the PASSWORD_HASH_WORKERS / PASSWORD_HASH_MAX_PENDING given here).
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def poll_pages(url, duration, out):
+    # separate process, so the measuring client does not share a GIL with the storm
+    latencies = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        start = time.monotonic()
+        try:
+            urllib.request.urlopen(url, timeout=30).read()
+            latencies.append((time.monotonic() - start) * 1000)
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.05)
+    out.put(latencies)
+
+
+def storm(url, clients, duration, backoff):
+    opener = urllib.request.build_opener(NoRedirect)
+    body = urllib.parse.urlencode({'username': 'admin', 'password': 'admin123'}).encode()
+    counts = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        while time.monotonic() < deadline:
+            try:
+                status = opener.open(url, data=body, timeout=30).status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except (urllib.error.URLError, OSError):
+                status = 'error'
+            with lock:
+                counts[status] = counts.get(status, 0) + 1
+            if status == 503:
+                time.sleep(backoff)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def run_scenario(name, env, args, port):
+    db_dir = tempfile.mkdtemp(prefix='sweethomes-bench-')
+    env = dict(os.environ, DATABASE_PATH=os.path.join(db_dir, 'houses.db'), FLASK_SECRET_KEY='bench',
+               GUNICORN_BIND=f'127.0.0.1:{port}', WEB_CONCURRENCY='1', **env)
+    command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--worker-class', 'gthread',
+               '--threads', str(args.threads), 'app:app']
+    if args.cpus and shutil.which('taskset'):
+        command = ['taskset', '-c', args.cpus] + command
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    try:
+        for _ in range(300):
+            try:
+                urllib.request.urlopen(base + '/market-stats', timeout=1).read()
+                break
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.1)
+        else:
+            raise RuntimeError(f'{name}: server did not start')
+
+        out = multiprocessing.Queue()
+        poller = multiprocessing.Process(target=poll_pages, args=(base + '/market-stats', args.duration, out))
+        poller.start()
+        counts = storm(base + '/login', args.clients, args.duration, args.backoff) if name != 'quiet' else {}
+        latencies = out.get()
+        poller.join()
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+    print(f"{name:10s} page p50 {percentile(latencies, 0.5):7.1f} ms  p95 {percentile(latencies, 0.95):7.1f} ms  "
+          f"p99 {percentile(latencies, 0.99):7.1f} ms  ({len(latencies)} polls)"
+          + (f"  logins ok {counts.get(302, 0)}, refused {counts.get(503, 0)}, "
+             f"other {sum(v for k, v in counts.items() if k not in (302, 503))}" if counts else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--clients', type=int, default=24)
+    parser.add_argument('--backoff', type=float, default=1.0, help='seconds a client waits after a 503')
+    parser.add_argument('--threads', type=int, default=32, help='gunicorn gthread threads')
+    parser.add_argument('--workers', default='1', help='PASSWORD_HASH_WORKERS for the pooled run')
+    parser.add_argument('--max-pending', default='4', help='PASSWORD_HASH_MAX_PENDING for the pooled run')
+    parser.add_argument('--cpus', default='0', help='taskset CPU list for the server ("" for no pinning)')
+    parser.add_argument('--port', type=int, default=8791)
+    args = parser.parse_args()
+
+    run_scenario('quiet', {}, args, args.port)
+    run_scenario('unbounded', {'PASSWORD_HASH_WORKERS': '64', 'PASSWORD_HASH_MAX_PENDING': '1000000'},
+                 args, args.port + 1)
+    run_scenario('pooled', {'PASSWORD_HASH_WORKERS': args.workers, 'PASSWORD_HASH_MAX_PENDING': args.max_pending},
+                 args, args.port + 2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+document.getElementById('ai-desc-btn').addEventListener('click', async () => {
+    const btn = document.getElementById('ai-desc-btn');
+    const originalText = btn.innerHTML;
+
+    btn.disabled = true;
+    btn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Creating magic...';
+
+    const data = {
+        title:       document.getElementById('title').value || "Dream Home",
+        location:     document.getElementById('location').value || "a beautiful city",
+        bedrooms:     document.querySelector('[name="bedrooms"]').value,
+        bathrooms:    document.querySelector('[name="bathrooms"]').value,
+        area_sqm:     document.querySelector('[name="area_sqm"]').value
+    };
+
+    try {
+        const resp = await fetch('/ai_description', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(data)
+        });
+
+        const result = await resp.json();
+
+        if (result.description) {
+            document.getElementById('description').value = result.description;
+        } else {
+            alert('AI failed: ' + (result.error || 'unknown'));
+        }
+    } catch (e) {
+        alert('Network error – check console');
+        console.error(e);
+    } finally {
+        btn.disabled = false;
+        btn.innerHTML = originalText;
+    }
+});
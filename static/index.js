@@ -0,0 +1,24 @@
+// Index page specific JavaScript
+document.addEventListener('DOMContentLoaded', function() {
+    // Auto-format price inputs
+    const priceInputs = document.querySelectorAll('input[name="min_price"], input[name="max_price"]');
+
+    priceInputs.forEach(input => {
+        input.addEventListener('blur', function() {
+            if (this.value) {
+                // Format number with commas
+                let value = this.value.replace(/,/g, '');
+                if (!isNaN(value) && value !== '') {
+                    this.value = Number(value).toLocaleString();
+                }
+            }
+        });
+
+        input.addEventListener('focus', function() {
+            // Remove commas for editing
+            if (this.value) {
+                this.value = this.value.replace(/,/g, '');
+            }
+        });
+    });
+});
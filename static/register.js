@@ -0,0 +1,14 @@
+document.addEventListener('DOMContentLoaded', () => {
+    const form = document.querySelector('form');
+    form.addEventListener('submit', (e) => {
+        const pass = document.querySelector('[name="password"]').value;
+        const confirm = document.querySelector('[name="confirm_password"]').value;
+        if (pass !== confirm) {
+            e.preventDefault();
+            alert('Passwords do not match!');
+        } else if (pass.length < 6) {
+            e.preventDefault();
+            alert('Password must be at least 6 characters');
+        }
+    });
+});
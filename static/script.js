@@ -146,6 +146,9 @@ document.addEventListener('DOMContentLoaded', function() {
                     if (box) {
                         box.style.display = "block";
                         box.textContent = "Predicted Price: € " + data.predicted_price;
+                        if (data.price_low != null && data.price_high != null) {
+                            box.textContent += " (likely range € " + data.price_low + " – € " + data.price_high + ")";
+                        }
                     }
 
                     // Fill the price input so user can modify it
@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# app.py and its helper modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set before app is imported anywhere: the tests get their own database
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='sweethomes-tests-'), 'houses.db')
+os.environ.setdefault('FLASK_SECRET_KEY', 'tests')
+
+
+@pytest.fixture(scope='session')
+def app():
+    import app as app_module
+    assert app_module.setup_database()  # creates and seeds the throwaway database
+    app_module.app.config['TESTING'] = True
+    return app_module
@@ -0,0 +1,32 @@
+"""minify_js must tell a division from a regex literal and leave string contents alone."""
+import pytest
+
+from assets import minify_js
+
+REVIEW_EXAMPLE = 'var n = origin / 2 + s.split(\'/\').length; var c = "it\'s"; var b = "http://x.com";'
+
+
+@pytest.mark.parametrize('source', [
+    REVIEW_EXAMPLE,
+    'var half = main / 2, rest = todo / 3;',
+    'var a = domain/ratio; var q = "don\'t";',
+    'var t = typeof_count / 2; var u = $in / 2;',
+])
+def test_division_after_identifier(source):
+    # a '/' misread as a regex start swallows the comment or keeps the indentation
+    assert minify_js('  ' + source + ' // note\n  var z = 1; /* done */\n') == source + '\nvar z = 1;'
+
+
+@pytest.mark.parametrize('source', [
+    'return /a\'b/.test(s);',
+    'if (x) return /\\/\\//.test(url);',
+    'var r = typeof /x/g;',
+    'var r = s.match(/[/"]/);',
+])
+def test_regex_literal_after_keyword_or_operator(source):
+    assert minify_js('  ' + source + ' // note\n') == source
+
+
+def test_comment_markers_inside_strings():
+    source = 'var b = "http://x.com", c = \'/* not a comment */\', d = `it\'s //`;'
+    assert minify_js(source + ' // link\n') == source
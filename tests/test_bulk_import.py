@@ -0,0 +1,24 @@
+"""Bulk import pricing when the model server is down."""
+
+
+class DeadModelServer:
+    def __init__(self):
+        self.calls = 0
+
+    def predict_many(self, rows):
+        self.calls += 1
+        raise ConnectionRefusedError('model server is down')
+
+    def predict_one(self, features):
+        return self.predict_many([features])[0]
+
+
+def test_dead_model_server_is_tried_once_per_batch(app, monkeypatch):
+    server = DeadModelServer()
+    monkeypatch.setattr(app, 'get_model_client', lambda: server)
+    monkeypatch.setattr(app, '_cached_predictor', server.predict_one)
+    rows = [{'gr_liv_area': 1000.0 + i, 'TotalBath': 2.0} for i in range(50)]
+    with app.app.app_context():
+        prices = app.predict_prices(rows)
+    assert server.calls == 1
+    assert prices == [app.fallback_price_range(row)['price'] for row in rows]
@@ -0,0 +1,20 @@
+"""The monitoring endpoints never load or train a model themselves."""
+import houseprice
+
+
+def test_metrics_without_saved_model_do_not_train(app, monkeypatch, tmp_path):
+    monkeypatch.setattr(houseprice, '_artifact', None)
+    monkeypatch.setattr(houseprice, 'MODEL_PATH', str(tmp_path / 'missing.joblib'))
+
+    def train_model(*args, **kwargs):
+        raise AssertionError('a monitoring request trained the model')
+    monkeypatch.setattr(houseprice, 'train_model', train_model)
+    monkeypatch.setattr(houseprice, 'load_data', train_model)
+
+    client = app.app.test_client()
+    response = client.get('/drift-report')
+    assert response.status_code == 200
+    assert response.get_json()['predictions'] == 0
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert 'price_predictions_total 0' in response.get_data(as_text=True)
@@ -0,0 +1,19 @@
+"""/export_listings filters and columns."""
+
+
+def export_lines(app, query):
+    response = app.app.test_client().get(f'/export_listings?format=csv&{query}')
+    assert response.status_code == 200
+    return response.get_data(as_text=True).splitlines()
+
+
+def test_city_filter_is_a_literal_substring(app):
+    assert len(export_lines(app, 'city=london')) == 2  # header + the seeded London listing
+    assert export_lines(app, 'city=%25') == export_lines(app, 'city=zzzz')
+    assert export_lines(app, 'city=_') == export_lines(app, 'city=zzzz')
+
+
+def test_header_without_rows_and_no_owner_columns(app):
+    lines = export_lines(app, 'city=zzzz')
+    assert len(lines) == 1
+    assert not {'owner_email', 'owner_phone', 'user_id'} & set(lines[0].split(','))
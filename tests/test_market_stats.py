@@ -0,0 +1,13 @@
+"""Incremental market statistics."""
+
+
+def test_removing_an_expired_listing_updates_the_stats(app):
+    with app.app.app_context():
+        session = app.db.session
+        before = app.MarketStat.query.filter_by(dimension='all', key='').one().count
+        house = app.House.query.filter_by(location='London, UK').one()
+        session.expire(house)  # e.g. after a commit: no column values in memory
+        app.record_market_change([house], -1)
+        assert app.MarketStat.query.filter_by(dimension='all', key='').one().count == before - 1
+        assert app.MarketStat.query.filter_by(dimension='location', key='London, UK').first() is None
+        session.rollback()
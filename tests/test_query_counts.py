@@ -0,0 +1,148 @@
+"""
+Queries per route (see get_current_user() / get_current_identity()): read-only
+pages render from the session snapshot without loading the user, and routes
+that do need the User row load it once.
+"""
+import re
+import time
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+USER_TABLE = re.compile(r'\bFROM "?user"?(\s|$)')
+
+
+@contextmanager
+def count_queries(app):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app.app_context():
+        engine = app.db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def user_queries(statements):
+    return [statement for statement in statements if USER_TABLE.search(statement)]
+
+
+@pytest.fixture
+def admin(app):
+    with app.app.app_context():
+        user = app.User.query.filter_by(username='admin').one()
+        house_id = app.House.query.order_by(app.House.id).first().id
+        return user.id, house_id
+
+
+@pytest.fixture
+def client(app, admin):
+    """Test client logged in as the seeded admin, with a fresh identity snapshot (as after /login)."""
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session.update({'user_id': admin[0], 'username': 'admin', 'is_admin': True,
+                        'identity_checked_at': int(time.time())})
+    return client
+
+
+def favorite(app, admin, present):
+    with app.app.app_context():
+        row = app.db.session.get(app.UserFavorites, admin)
+        if present and row is None:
+            app.db.session.add(app.UserFavorites(user_id=admin[0], house_id=admin[1]))
+        elif not present and row is not None:
+            app.db.session.delete(row)
+        app.db.session.commit()
+
+
+# (method, url, total queries, queries on the user table)
+ROUTES = [
+    ('get', '/', 1, 0),
+    ('get', '/house/{house}', 3, 0),
+    ('get', '/add', 0, 0),
+    ('get', '/register', 0, 0),
+    ('get', '/login', 1, 1),
+    ('get', '/is_favorite/{house}', 1, 0),
+    ('get', '/profile', 3, 1),
+]
+
+
+@pytest.mark.parametrize('method, url, total, users', ROUTES)
+def test_route_query_count(app, admin, client, method, url, total, users):
+    url = url.format(house=admin[1])
+    with count_queries(app) as statements:
+        response = getattr(client, method)(url)
+    assert response.status_code == 200
+    assert len(user_queries(statements)) == users, statements
+    assert len(statements) == total, statements
+
+
+def test_search_query_count(app, client):
+    client.get('/search?city=london')  # fills the facet count cache
+    with count_queries(app) as statements:
+        response = client.get('/search?city=london')
+    assert response.status_code == 200
+    # listings + the facet cache's version check
+    assert user_queries(statements) == []
+    assert len(statements) == 2, statements
+
+
+def test_add_favorite_query_count(app, admin, client):
+    favorite(app, admin, present=False)
+    with count_queries(app) as statements:
+        response = client.post(f'/add_favorite/{admin[1]}')
+    assert response.get_json()['success']
+    # user, house, existing favorite, insert
+    assert len(user_queries(statements)) == 1
+    assert len(statements) == 4, statements
+
+
+def test_remove_favorite_query_count(app, admin, client):
+    favorite(app, admin, present=True)
+    with count_queries(app) as statements:
+        response = client.post(f'/remove_favorite/{admin[1]}')
+    assert response.get_json()['success']
+    # user, favorite row, delete
+    assert len(user_queries(statements)) == 1
+    assert len(statements) == 3, statements
+
+
+def test_stale_snapshot_checks_user_once(app, admin, client):
+    with client.session_transaction() as session:
+        session['identity_checked_at'] = 0
+    with count_queries(app) as statements:
+        client.get('/')
+        client.get('/')
+    # the first request refreshes the snapshot, the second uses it again
+    assert len(user_queries(statements)) == 1
+
+
+def test_delete_house_query_count(app, admin, client):
+    with app.app.app_context():
+        house = app.House(title='Cabin', price='100000', location='Oslo', user_id=admin[0])
+        app.db.session.add(house)
+        app.db.session.commit()
+        house_id = house.id
+    with count_queries(app) as statements:
+        response = client.post(f'/delete_house/{house_id}')
+    assert response.status_code == 302
+    # house, user, favorites / images deletes, the relationship loads of the flush,
+    # market_stat bookkeeping (~8) and the listings cache version bump
+    assert len(user_queries(statements)) == 1
+    assert len(statements) == 17, statements
+
+
+def test_login_query_count(app):
+    client = app.app.test_client()
+    with count_queries(app) as statements:
+        response = client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 302
+    # the user lookup only: the hash is current, so there is no rehash UPDATE
+    assert len(user_queries(statements)) == 1
+    assert len(statements) == 1, statements
@@ -0,0 +1,32 @@
+"""`flask refresh-model` trains on the listings added since the watermark."""
+import houseprice
+
+
+def test_refresh_uses_columns_for_listing_without_ml_fields(app, monkeypatch):
+    with app.app.app_context():
+        watermark = app.db.session.query(app.db.func.max(app.House.updated_at)).scalar()
+        # what add_house / bulk import store when no ML fields were entered
+        house = app.House(title='Plain listing', price='300000', location='Paris', bedrooms=2,
+                          bathrooms=1.5, area_sqm=80, model_features='{}')
+        app.db.session.add(house)
+        app.db.session.commit()
+        house_id = house.id
+
+    seen = {}
+    monkeypatch.setattr(houseprice, 'load_model', lambda: {'watermark': watermark.isoformat()})
+    monkeypatch.setattr(houseprice, 'save_model', lambda artifact: None)
+
+    def refresh_model(artifact, features, prices, **kwargs):
+        seen['features'], seen['prices'] = features, prices
+        return None, {'rows': len(prices), 'holdout_rows': 1,
+                      'holdout_rmse_before': 0.0, 'holdout_rmse_after': 0.0}
+    monkeypatch.setattr(houseprice, 'refresh_model', refresh_model)
+
+    try:
+        app.app.test_cli_runner().invoke(args=['refresh-model', '--min-rows', '1'])
+        assert seen['prices'] == [300000.0]
+        assert seen['features'] == [{'gr_liv_area': 80 * 10.7639, 'TotalBath': 1.5}]
+    finally:
+        with app.app.app_context():
+            app.db.session.delete(app.db.session.get(app.House, house_id))
+            app.db.session.commit()
@@ -0,0 +1,50 @@
+"""/search filters: invalid parameters are reported per filter, and map searches skip the facet counts."""
+import html
+
+import pytest
+
+
+@pytest.mark.parametrize('query, warning', [
+    ('min_price=abc', 'Invalid minimum price'),
+    ('bedrooms=x', 'Invalid filter: invalid bedrooms value'),
+    ('area=bogus', "Invalid filter: invalid area value 'bogus'"),
+])
+def test_invalid_filter_warns(app, query, warning):
+    response = app.app.test_client().get(f'/search?{query}')
+    assert response.status_code == 200
+    assert warning in html.unescape(response.get_data(as_text=True))
+
+
+def test_invalid_filter_keeps_the_others(app):
+    from werkzeug.datastructures import MultiDict
+    errors = {}
+    filters = app.facet_filters(MultiDict([('min_price', 'abc'), ('bedrooms', '4'), ('area', 'bogus')]), errors)
+    assert set(errors) == {'min_price', 'area'}
+    assert filters['bedrooms'] == [4] and filters['area'] == [] and filters['min_price'] is None
+
+
+def test_facets_api_rejects_invalid_filter(app):
+    response = app.app.test_client().get('/search/facets?bedrooms=x')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'invalid bedrooms value'}
+
+
+def test_map_search_skips_facet_counts(app, monkeypatch):
+    def get_facets(filters):
+        raise AssertionError('facet counts computed for a map search')
+    monkeypatch.setattr(app, 'get_facets', get_facets)
+    response = app.app.test_client().get('/search?near=London&radius=50&area=50-100&area=0-50&bathrooms=2.5')
+    assert response.status_code == 200
+    text = html.unescape(response.get_data(as_text=True))
+    assert 'within 50 km of London' in text
+    assert 'area: 0–50 / 50–100' in text and 'bathrooms: 2.5' in text
+
+
+def test_selected_facet_labels_match_the_facet_list(app):
+    filters = {'property_type': ['Villa'], 'bedrooms': [3], 'bathrooms': [2.0], 'area': ['300+', '50-100'],
+               'price_range': [], 'city': '', 'min_price': None, 'max_price': None}
+    with app.app.test_request_context():
+        facets = app.compute_facets(filters)['facets']
+    listed = {name: [option['label'] for option in options if option['selected']]
+              for name, options in facets.items() if any(option['selected'] for option in options)}
+    assert app.selected_facet_labels(filters) == listed
@@ -0,0 +1,20 @@
+"""`import app` time and worker RSS stay within the startup budgets (see `flask startup-report`)."""
+import os
+
+import pytest
+
+import app as app_module
+
+
+def test_import_time_within_budget():
+    import_ms, children, _ = app_module.measure_startup(with_model=False)
+    slowest = ', '.join(f'{name} {us / 1000:.0f} ms' for us, name in children[:5])
+    assert import_ms <= app_module.IMPORT_TIME_BUDGET_MS, f'import app took {import_ms:.0f} ms ({slowest})'
+
+
+def test_worker_rss_within_budget():
+    import houseprice
+    if not os.path.exists(houseprice.MODEL_PATH):
+        pytest.skip('no saved price model; train one with `python houseprice.py`')
+    _, _, rss_mb = app_module.measure_startup(with_model=True)
+    assert rss_mb <= app_module.WORKER_RSS_BUDGET_MB, f'worker peak RSS {rss_mb:.0f} MB'